@@ -22,7 +22,7 @@ setup(
     ],
     entry_points={
         'gui_scripts': [
-            'traffic-cop = trafficcop.app:main',
+            'traffic-cop = trafficcop.cli:main',
         ],
     },
     # Handling direct file installation here rather than with debian/install.
@@ -0,0 +1,42 @@
+import logging
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from trafficcop import client
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+
+class Reader(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.reader = client.SnapshotReader()
+
+    def test_partial_lines(self):
+        self.assertEqual(self.reader.feed(b'{"a": 1}\n{"b"'), [{'a': 1}])
+        self.assertEqual(self.reader.feed(b': 2}\n'), [{'b': 2}])
+
+    def test_invalid_line(self):
+        self.assertEqual(self.reader.feed(b'x\n{"a": 1}\n'), [{'a': 1}])
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+
+class NoCollector(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = Path(self.tmp.name) / 'none.sock'
+
+    def test_connect(self):
+        self.assertIsNone(client.connect(self.socket_path))
+
+    def test_subscribe(self):
+        with self.assertRaises(ConnectionRefusedError):
+            next(client.subscribe(self.socket_path))
+
+    def tearDown(self):
+        self.tmp.cleanup()
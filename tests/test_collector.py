@@ -0,0 +1,84 @@
+import logging
+import psutil
+import re
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import yaml
+
+from pathlib import Path
+
+from trafficcop import client
+from trafficcop import collector
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+DATA_DIR = Path(__file__).parent / 'data'
+
+
+class Replay(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_dir = Path(self.tmp.name)
+        # The trace's process has pid 1, which always exists.
+        name = re.escape(psutil.Process(1).name())
+        config = {'processes': {'Init': {'match': [{'name': name}]}}}
+        config_file = tmp_dir / 'traffic-cop.yaml'
+        config_file.write_text(yaml.safe_dump(config))
+        self.socket_path = tmp_dir / 'collector.sock'
+        command = [
+            sys.executable,
+            str(DATA_DIR / 'nethogs-stub'),
+            str(DATA_DIR / 'nethogs-trace.txt'),
+            '0.05',
+        ]
+        self.collector = collector.Collector(
+            self.socket_path,
+            config_file,
+            interval=0.05,
+            command=command,
+        )
+        self.thread = threading.Thread(
+            target=self.collector.run,
+            daemon=True,
+        )
+        self.thread.start()
+        for i in range(100):
+            if self.socket_path.exists():
+                break
+            time.sleep(0.05)
+
+    def wait_for_rates(self, snapshots):
+        for snapshot in snapshots:
+            if 'Init' in snapshot['rates']:
+                return snapshot
+
+    def test_snapshots(self):
+        snapshots = client.subscribe(self.socket_path, timeout=5)
+        snapshot = self.wait_for_rates(snapshots)
+        rate_dn, rate_up = snapshot['rates']['Init']
+        self.assertGreater(rate_dn, rate_up)
+        self.assertGreater(snapshot['scopes']['Init']['bytes_dn'], 0)
+        self.assertIn('unknown TCP', snapshot['scopes'])
+        self.assertIn('Global', snapshot['scopes'])
+
+    def test_two_clients(self):
+        first = client.subscribe(self.socket_path, timeout=5)
+        second = client.subscribe(self.socket_path, timeout=5)
+        self.assertIsNotNone(self.wait_for_rates(first))
+        self.assertIsNotNone(self.wait_for_rates(second))
+
+    def test_already_running(self):
+        other = collector.Collector(self.socket_path, command=['true'])
+        with self.assertRaises(RuntimeError):
+            other.listen()
+
+    def tearDown(self):
+        self.collector.stop()
+        self.thread.join(5)
+        self.tmp.cleanup()
+        logging.disable(logging.NOTSET)
@@ -4,6 +4,7 @@ import unittest
 from pathlib import Path
 
 from trafficcop import config
+from trafficcop import store
 from trafficcop import utils
 
 # Assert*() methods here:
@@ -17,7 +18,10 @@ class Yaml(unittest.TestCase):
         self.data_dir = tests_dir / 'data'
         self.fallback_file = self.data_dir / 'traffic-cop.yaml.default'
         default_yaml_file = self.data_dir / 'traffic-cop.yaml.default'
-        self.default_store = config.convert_yaml_to_store(default_yaml_file, test=True)
+        self.default_store = store.convert_yaml_to_store(
+            default_yaml_file,
+            test=True,
+        )
 
     def test_bad_syntax_empty_file(self):
         yaml_file = self.data_dir / 'empty.yaml'
@@ -51,9 +55,9 @@ class Yaml(unittest.TestCase):
 
     def test_convert_bad_syntax(self):
         yaml_file = self.data_dir / 'bad_syntax.yaml'
-        store = config.convert_yaml_to_store(yaml_file, test=True)
-        self.assertNotEqual(store, '')
-        for row in store:
+        config_store = store.convert_yaml_to_store(yaml_file, test=True)
+        self.assertNotEqual(config_store, '')
+        for row in config_store:
             # Ensure row has the correct number of columns.
             self.assertEqual(len(row[:]), 13)
 
@@ -66,12 +70,12 @@ class Yaml(unittest.TestCase):
 
     @unittest.skip('causes GTK error during package build')
     def test_create_treeview(self):
-        tree = config.create_config_treeview(self.default_store)
+        tree = store.create_config_treeview(self.default_store)
         self.assertTrue(tree)
 
     @unittest.skip('needs work')
     def test_update_config_store(self):
-        new = config.update_config_store(None, self.default_store)
+        new = store.update_config_store(None, self.default_store)
         self.assertNotEqual(None, new)
 
     def tearDown(self):
@@ -103,7 +107,7 @@ class Bytes(unittest.TestCase):
             ['16', 'KB/s'],
             ['375', 'KB/s'],
             ['3', 'MB/s'],
-            ['854', 'MB/s'],
+            ['940', 'MB/s'],
         ]
         for i in range(len(rates)):
             human = config.convert_config_rates_to_human(rates[i])
@@ -111,3 +115,43 @@ class Bytes(unittest.TestCase):
 
     def tearDown(self):
         pass
+
+
+class Errors(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = Path(__file__).parent / 'data'
+
+    def test_valid_config(self):
+        content = config.load_config(self.data_dir / 'traffic-cop.yaml')
+        self.assertEqual(content['download'], '3mbit')
+        self.assertIn('Skype', content['processes'])
+
+    def test_error_location(self):
+        yaml_file = self.data_dir / 'bad_syntax_wrong_parameter.yaml'
+        with self.assertRaises(config.ConfigError) as cm:
+            config.load_config(yaml_file)
+        self.assertEqual((cm.exception.line, cm.exception.column), (5, 5))
+        self.assertIn("Wrong key 'dl'", str(cm.exception))
+        # What was parsed is kept, for callers that use it anyway.
+        self.assertIn('Firefox', cm.exception.content['processes'])
+
+    def test_missing_match(self):
+        yaml_file = self.data_dir / 'bad_syntax_no_match.yaml'
+        with self.assertRaises(config.ConfigError) as cm:
+            config.load_config(yaml_file)
+        self.assertEqual(cm.exception.line, 4)
+        self.assertIn("Missing key: 'match'", str(cm.exception))
+
+    def test_yaml_syntax_error(self):
+        yaml_file = self.data_dir / 'bad_syntax_yaml.yaml'
+        with self.assertRaises(config.ConfigError) as cm:
+            config.load_config(yaml_file)
+        self.assertEqual(cm.exception.line, 4)
+        self.assertIsNone(cm.exception.content)
+
+    def test_empty_file(self):
+        with self.assertRaises(config.ConfigError):
+            config.load_config(self.data_dir / 'empty.yaml')
+
+    def tearDown(self):
+        pass
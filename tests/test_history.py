@@ -0,0 +1,90 @@
+import unittest
+
+from trafficcop import history
+from trafficcop import rates
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+
+class Ring(unittest.TestCase):
+    def setUp(self):
+        self.h = history.ScopeHistory(4)
+
+    def test_wraps_at_fixed_size(self):
+        for t in range(10):
+            self.h.add(float(t), t * 100, t * 10)
+        self.assertEqual(self.h.count, 4)
+        self.assertEqual(len(self.h.times), 4)
+        self.assertEqual(list(self.h.ordered(self.h.times)), [6, 7, 8, 9])
+
+    def test_ignores_old_samples(self):
+        self.assertTrue(self.h.add(1.0, 0, 0))
+        self.assertFalse(self.h.add(1.0, 100, 100))
+        self.assertEqual(self.h.count, 1)
+
+    def test_reset_counts_as_no_traffic(self):
+        self.h.add(0.0, 1000, 1000)
+        self.h.add(1.0, 10, 10)
+        self.assertEqual(self.h.rates_dn[1], 0)
+
+
+class Stats(unittest.TestCase):
+    def setUp(self):
+        self.h = history.ScopeHistory(600)
+        # 100 B/s down, then one 1000 B/s second, then 0 B/s.
+        totals = [0, 100, 200, 300, 1300, 1300, 1300]
+        for t, b in enumerate(totals):
+            self.h.add(float(t), b, 0)
+
+    def test_average(self):
+        stats = self.h.stats()
+        self.assertAlmostEqual(stats.avg_dn, 1300 / 6)
+        self.assertEqual(stats.avg_up, 0)
+        self.assertAlmostEqual(self.h.stats(window=2).avg_dn, 0)
+
+    def test_peak(self):
+        self.assertEqual(self.h.stats().peak_dn, 1000)
+        self.assertEqual(self.h.stats(window=2).peak_dn, 0)
+
+    def test_ewma(self):
+        h = history.ScopeHistory(600)
+        for t in range(60):
+            h.add(float(t), t * 1000, 0, tau=5.0)
+        self.assertAlmostEqual(h.ewma_dn, 1000, delta=1)
+        # Decays without traffic.
+        for t in range(60, 70):
+            h.add(float(t), 59000, 0, tau=5.0)
+        self.assertLess(h.ewma_dn, 1000 * 0.2)
+
+
+class Scopes(unittest.TestCase):
+    def setUp(self):
+        self.history = history.RateHistory(seconds=10, interval=1.0)
+        self.scopes = {'Global': rates.new_scope_data()}
+
+    def sample(self, t, b_up, b_dn):
+        self.scopes['Global']['now'] = {
+            'time': t,
+            'bytes_up': b_up,
+            'bytes_dn': b_dn,
+        }
+        self.history.add_samples(self.scopes)
+
+    def test_size(self):
+        for t in range(20):
+            self.sample(float(t), 0, 0)
+        self.assertEqual(self.history.scopes['Global'].count, 10)
+
+    def test_get_rates(self):
+        self.sample(0.0, 0, 0)
+        self.assertIsNone(self.history.get_rates('Global'))
+        self.sample(1.0, 0.1, 1000)
+        rate_dn, rate_up = self.history.get_rates('Global')
+        self.assertGreater(rate_dn, 0)
+        # Tiny rates are shown as 0.
+        self.assertEqual(rate_up, 0)
+
+    def test_skips_incomplete(self):
+        self.history.add_samples({'x': rates.new_scope_data()})
+        self.assertNotIn('x', self.history.scopes)
@@ -0,0 +1,136 @@
+import unittest
+
+from trafficcop import hotapply
+from trafficcop import model
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+# "tc class show" output for a config with Global, Skype and Zoom limits,
+# without the burst sizes.
+UP_CLASSES = """\
+class htb 1:1 root rate 2Mbit ceil 2Mbit
+class htb 1:2 parent 1:1 prio 1 rate 128Kbit ceil 2Mbit
+class htb 1:3 parent 1:1 prio 0 rate 8bit ceil 280Kbit
+class htb 1:4 parent 1:1 prio 0 rate 8bit ceil 240Kbit
+"""
+DN_CLASSES = """\
+class htb 1:1 root rate 3Mbit ceil 3Mbit
+class htb 1:2 parent 1:1 prio 1 rate 128Kbit ceil 3Mbit
+class htb 1:3 parent 1:1 prio 0 rate 8bit ceil 560Kbit
+class htb 1:4 parent 1:1 prio 0 rate 8bit ceil 480Kbit
+"""
+
+
+def make_model(skype_dn='70kbps', zoom_up='30kbps', **skype):
+    return model.ConfigModel.from_dict({
+        'Global': {'download': '3mbit', 'upload': '2mbit'},
+        'Skype': {
+            'download': skype_dn,
+            'upload': '35kbps',
+            'download-priority': 0,
+            'upload-priority': 0,
+            'match': [{'name': 'skype'}],
+            **skype,
+        },
+        'Zoom': {
+            'download': '60kbps',
+            'upload': zoom_up,
+            'download-priority': 0,
+            'upload-priority': 0,
+            'match': [{'exe': '/opt/zoom/zoom'}],
+        },
+    })
+
+
+class Classes(unittest.TestCase):
+    def setUp(self):
+        self.classes = hotapply.parse_classes(UP_CLASSES, 'eth0')
+
+    def test_parse_classes(self):
+        self.assertEqual(len(self.classes), 4)
+        root, default, skype, zoom = self.classes
+        self.assertEqual(root.parent, '1:')
+        self.assertIsNone(root.prio)
+        self.assertEqual(skype.classid, '1:3')
+        self.assertEqual(skype.prio, 0)
+        self.assertEqual(skype.ceil, 35000)
+        self.assertEqual(default.rate, 16000)
+
+    def test_find_class(self):
+        limits = hotapply.Limits(30000, None, 0)
+        found = hotapply.find_class(self.classes, limits)
+        self.assertEqual(found.classid, '1:4')
+        limits = hotapply.Limits(None, None, 0)
+        self.assertIsNone(hotapply.find_class(self.classes, limits))
+
+    def tearDown(self):
+        pass
+
+
+class Plan(unittest.TestCase):
+    def setUp(self):
+        self.dn = hotapply.parse_classes(DN_CLASSES, 'ifb0')
+        self.up = hotapply.parse_classes(UP_CLASSES, 'eth0')
+
+    def plan(self, new):
+        return hotapply.plan_changes(make_model(), new, self.dn, self.up)
+
+    def test_no_changes(self):
+        self.assertEqual(self.plan(make_model()), [])
+
+    def test_changed_limits(self):
+        changes = self.plan(make_model(skype_dn='100kbps', zoom_up='50kbps'))
+        self.assertEqual(changes, [
+            [
+                'class', 'change', 'dev', 'ifb0', 'parent', '1:1',
+                'classid', '1:3', 'htb', 'rate', '1bps',
+                'ceil', '100000bps', 'prio', '0',
+            ],
+            [
+                'class', 'change', 'dev', 'eth0', 'parent', '1:1',
+                'classid', '1:4', 'htb', 'rate', '1bps',
+                'ceil', '50000bps', 'prio', '0',
+            ],
+        ])
+
+    def test_changed_priority(self):
+        changes = self.plan(make_model(**{'upload-priority': 2}))
+        self.assertEqual(changes[0][3], 'eth0')
+        self.assertEqual(changes[0][-2:], ['prio', '2'])
+
+    def test_new_scope_needs_restart(self):
+        new = make_model()
+        new = new._replace(scopes=new.scopes[:-1])
+        with self.assertRaises(hotapply.NeedsRestart):
+            self.plan(new)
+
+    def test_new_match_needs_restart(self):
+        with self.assertRaises(hotapply.NeedsRestart):
+            self.plan(make_model(match=[{'name': 'skypeforlinux'}]))
+
+    def test_removed_limit_needs_restart(self):
+        with self.assertRaises(hotapply.NeedsRestart):
+            self.plan(make_model(skype_dn=''))
+
+    def test_ambiguous_class_needs_restart(self):
+        # Zoom's download class can't be told apart from Skype's.
+        old = make_model(skype_dn='60kbps')
+        self.dn = hotapply.parse_classes(
+            DN_CLASSES.replace('560Kbit', '480Kbit'),
+            'ifb0',
+        )
+        with self.assertRaises(hotapply.NeedsRestart):
+            hotapply.plan_changes(
+                old,
+                make_model(skype_dn='90kbps'),
+                self.dn,
+                self.up,
+            )
+
+    def test_percent_needs_restart(self):
+        with self.assertRaises(hotapply.NeedsRestart):
+            self.plan(make_model(skype_dn='10%'))
+
+    def tearDown(self):
+        pass
@@ -0,0 +1,116 @@
+import logging
+import unittest
+
+from trafficcop import matcher
+from trafficcop import procs
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+
+class Scopes(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        rules = [
+            ('Global', '', ''),
+            ('unknown TCP', '', 'unknown'),
+            ('Zoom', 'name', 'zoom'),
+            ('Firefox', 'exe', '/usr/lib/firefox/firefox'),
+            ('Updates', 'cmdline', '.*apt(-get)? (update|upgrade)'),
+            ('Python', 'name', 'python3?'),
+            ('Browsers', 'cmdline', '/usr/lib/(firefox|chromium)/'),
+        ]
+        self.matcher = matcher.ScopeMatcher(rules)
+
+    def proc(self, name='', exe='', cmdline=[]):
+        return procs.ProcInfo(1, 0.0, name, exe, cmdline)
+
+    def test_exe(self):
+        p = self.proc('firefox', '/usr/lib/firefox/firefox', ['firefox'])
+        self.assertEqual(self.matcher.match(p), 'Firefox')
+
+    def test_name_prefix(self):
+        # Same as re.match(): literal patterns match at the start.
+        self.assertEqual(self.matcher.match(self.proc('zoom')), 'Zoom')
+        self.assertEqual(self.matcher.match(self.proc('zoom.real')), 'Zoom')
+        self.assertIsNone(self.matcher.match(self.proc('zoo')))
+
+    def test_name_regex(self):
+        self.assertEqual(self.matcher.match(self.proc('python3')), 'Python')
+
+    def test_cmdline(self):
+        p = self.proc('apt', '/usr/bin/apt', ['sudo', 'apt', 'upgrade'])
+        self.assertEqual(self.matcher.match(p), 'Updates')
+
+    def test_first_rule_wins(self):
+        # Matches both 'Firefox' (exe) and 'Browsers' (cmdline).
+        p = self.proc('x', '/usr/lib/firefox/firefox', ['/usr/lib/firefox/x'])
+        self.assertEqual(self.matcher.match(p), 'Firefox')
+        p = self.proc('zoom', '', ['/usr/lib/chromium/chromium'])
+        self.assertEqual(self.matcher.match(p), 'Zoom')
+
+    def test_no_match(self):
+        p = self.proc('bash', '/usr/bin/bash', None)
+        self.assertIsNone(self.matcher.match(p))
+
+    def test_rules_from_config(self):
+        content = {
+            'download': '1mbit',
+            'processes': {
+                'Zoom': {'match': [{'name': 'zoom'}]},
+                'Firefox': {'match': [{'exe': '/usr/lib/firefox/firefox'}]},
+            },
+        }
+        self.assertEqual(matcher.get_rules(content), [
+            ('Global', '', ''),
+            ('unknown TCP', '', ''),
+            ('unknown UDP', '', ''),
+            ('Zoom', 'name', 'zoom'),
+            ('Firefox', 'exe', '/usr/lib/firefox/firefox'),
+        ])
+
+    def test_invalid_pattern(self):
+        m = matcher.ScopeMatcher([('Bad', 'cmdline', '(')])
+        self.assertIsNone(m.match(self.proc('x', '', ['(x'])))
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+
+class Cache(unittest.TestCase):
+    def setUp(self):
+        self.matcher = matcher.ScopeMatcher([('Zoom', 'name', 'zoom')])
+        self.cache = matcher.ScopeCache(maxsize=2)
+        self.zoom = procs.ProcInfo(1, 1.0, 'zoom', '', [])
+        self.bash = procs.ProcInfo(2, 2.0, 'bash', '', [])
+
+    def test_positive_and_negative(self):
+        self.assertEqual(self.cache.lookup(self.zoom, self.matcher), 'Zoom')
+        self.assertIsNone(self.cache.lookup(self.bash, self.matcher))
+        self.assertEqual(self.cache.entries[self.bash.key], None)
+
+    def test_memoized(self):
+        self.cache.lookup(self.zoom, self.matcher)
+        self.cache.entries[self.zoom.key] = 'Memo'
+        self.assertEqual(self.cache.lookup(self.zoom, self.matcher), 'Memo')
+
+    def test_new_matcher_clears(self):
+        self.cache.lookup(self.zoom, self.matcher)
+        new = matcher.ScopeMatcher([])
+        self.assertIsNone(self.cache.lookup(self.zoom, new))
+
+    def test_discard(self):
+        self.cache.lookup(self.zoom, self.matcher)
+        self.cache.discard([self.zoom.key])
+        self.assertNotIn(self.zoom.key, self.cache.entries)
+
+    def test_lru_eviction(self):
+        other = procs.ProcInfo(3, 3.0, 'zoom', '', [])
+        self.cache.lookup(self.zoom, self.matcher)
+        self.cache.lookup(self.bash, self.matcher)
+        self.cache.lookup(self.zoom, self.matcher)
+        self.cache.lookup(other, self.matcher)
+        self.assertEqual(list(self.cache.entries), [self.zoom.key, other.key])
+
+    def tearDown(self):
+        pass
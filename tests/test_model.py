@@ -0,0 +1,193 @@
+import logging
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from trafficcop import config
+from trafficcop import history
+from trafficcop import model
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+
+class Config(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.cache_dir = tempfile.mkdtemp()
+        data_dir = Path(__file__).parent / 'data'
+        self.model = model.load_config(
+            data_dir / 'traffic-cop.yaml',
+            True,
+            self.cache_dir,
+        )
+
+    def test_scopes_in_config_order(self):
+        self.assertEqual(
+            self.model.names(),
+            [
+                'Global', 'unknown TCP', 'unknown UDP',
+                'Speedtest', 'Skype', 'Insync', 'Spotify', 'Zoom',
+            ],
+        )
+
+    def test_scope_config(self):
+        skype = self.model.get('Skype')
+        self.assertEqual(skype.download, '70kbps')
+        self.assertEqual(skype.upload_priority, 0)
+        self.assertEqual(skype.rule, ('Skype', 'name', 'skype'))
+        self.assertEqual(self.model.get('Global').download, '3mbit')
+        self.assertIsNone(self.model.get('Firefox'))
+
+    def test_store_row(self):
+        row = self.model.get('Skype').to_row()
+        self.assertEqual(len(row), 13)
+        self.assertEqual(row[:3], ['Skype', '70 KB/s', '35 KB/s'])
+        self.assertEqual(row[11:], ['name', 'skype'])
+
+    def test_matcher_from_model(self):
+        proc = SimpleNamespace(name='skypeforlinux', exe='', cmdline='')
+        self.assertEqual(self.model.matcher.match(proc), 'Skype')
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.model.get('Zoom').download = '1mbit'
+
+    def test_no_usable_config(self):
+        data_dir = Path(__file__).parent / 'data'
+        empty = data_dir / 'empty.yaml'
+        self.assertIsNone(model.load_config(empty, True, self.cache_dir))
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+        logging.disable(logging.NOTSET)
+
+
+class Cache(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.cache_dir = Path(tempfile.mkdtemp())
+        data_dir = Path(__file__).parent / 'data'
+        self.config_file = self.cache_dir / 'traffic-cop.yaml'
+        shutil.copy(data_dir / 'traffic-cop.yaml', self.config_file)
+
+    def load(self):
+        return model.load_config(self.config_file, True, self.cache_dir)
+
+    def test_unchanged_config_not_parsed(self):
+        first = self.load()
+        self.assertTrue((self.cache_dir / model.CACHE_NAME).is_file())
+        with mock.patch.object(config, 'parse_yaml') as parse_yaml:
+            cached = self.load()
+        parse_yaml.assert_not_called()
+        self.assertEqual(cached.scopes, first.scopes)
+        self.assertEqual(cached.rows, first.rows)
+        self.assertEqual(cached.matcher.exes, first.matcher.exes)
+
+    def test_changed_config_parsed(self):
+        self.load()
+        text = self.config_file.read_text()
+        self.config_file.write_text(text.replace('70kbps', '80kbps'))
+        self.assertEqual(self.load().get('Skype').download, '80kbps')
+
+    def test_invalid_config_not_cached(self):
+        self.config_file.write_text('download: 3mbps\nprocesses:\n  Fake:\n')
+        self.assertIsNotNone(self.load())
+        self.assertFalse((self.cache_dir / model.CACHE_NAME).exists())
+
+    def test_corrupt_cache_ignored(self):
+        (self.cache_dir / model.CACHE_NAME).write_bytes(b'not a pickle')
+        self.assertEqual(self.load().get('Skype').download, '70kbps')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+        logging.disable(logging.NOTSET)
+
+
+class Diff(unittest.TestCase):
+    def setUp(self):
+        self.old = model.ConfigModel.from_dict({
+            'Global': {'download': '3mbit'},
+            'Zoom': {'download': '60kbps', 'match': [{'exe': '/opt/zoom'}]},
+            'Skype': {'download': '70kbps', 'match': [{'name': 'skype'}]},
+        })
+
+    def test_no_changes(self):
+        changes = model.diff_models(self.old, self.old)
+        self.assertEqual(changes, model.ConfigChanges([], [], []))
+
+    def test_changes(self):
+        new = model.ConfigModel.from_dict({
+            'Global': {'download': '3mbit'},
+            'Teams': {'download': '1mbit', 'match': [{'name': 'teams'}]},
+            'Zoom': {'download': '80kbps', 'match': [{'exe': '/opt/zoom'}]},
+            'Slack': {'match': [{'name': 'slack'}]},
+        })
+        changes = model.diff_models(self.old, new)
+        self.assertEqual(changes.removed, ['Skype'])
+        self.assertEqual(
+            changes.updated,
+            [('Zoom', ['80 KB/s', '', '', '', 9, 9])],
+        )
+        self.assertEqual(
+            [(previous, row[0]) for previous, row in changes.added],
+            [('Global', 'Teams'), ('Zoom', 'Slack')],
+        )
+
+    def test_added_first(self):
+        new = model.ConfigModel.from_dict({'New': {}, 'Global': {}})
+        changes = model.diff_models(model.ConfigModel(), new)
+        self.assertEqual(changes.added[0][0], None)
+        self.assertEqual(changes.added[1][0], 'New')
+
+    def test_match_change_is_not_a_store_change(self):
+        new = model.ConfigModel.from_dict({
+            'Global': {'download': '3mbit'},
+            'Zoom': {'download': '60kbps', 'match': [{'exe': '/usr/zoom'}]},
+            'Skype': {'download': '70kbps', 'match': [{'name': 'skype'}]},
+        })
+        changes = model.diff_models(self.old, new)
+        self.assertEqual(changes, model.ConfigChanges([], [], []))
+        self.assertEqual(new.matcher.exes['/usr/zoom'][1], 'Zoom')
+
+    def tearDown(self):
+        pass
+
+
+class Stats(unittest.TestCase):
+    def setUp(self):
+        self.scopes = {
+            'Zoom': {
+                'last': {'time': 0.0, 'bytes_up': 0, 'bytes_dn': 0},
+                'now': {'time': 2.0, 'bytes_up': 1000, 'bytes_dn': 4000},
+            },
+            'Idle': {
+                'last': {'time': None, 'bytes_up': None, 'bytes_dn': None},
+                'now': {'time': 2.0, 'bytes_up': 0, 'bytes_dn': 0},
+            },
+        }
+
+    def test_scope_stats(self):
+        stats = model.get_scope_stats(self.scopes)
+        self.assertEqual(list(stats), ['Zoom'])
+        self.assertEqual(
+            stats['Zoom'],
+            model.ScopeStats('Zoom', 4000, 1000, 2000.0, 500.0),
+        )
+
+    def test_scope_stats_from_history(self):
+        rate_history = history.RateHistory(10, 1.0)
+        rate_history.add_samples(
+            {'Zoom': {'now': self.scopes['Zoom']['last']}}
+        )
+        rate_history.add_samples(self.scopes)
+        stats = model.get_scope_stats(self.scopes, rate_history)
+        self.assertEqual(stats['Zoom'].bytes_dn, 4000)
+        self.assertGreater(stats['Zoom'].rate_dn, 0)
+
+    def tearDown(self):
+        pass
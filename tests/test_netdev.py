@@ -0,0 +1,229 @@
+import logging
+import tempfile
+import unittest
+
+from pathlib import Path
+from unittest import mock
+
+from trafficcop import netdev
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+ROUTE_HEADER = (
+    'Iface\tDestination\tGateway\tFlags\tRefCnt\tUse\tMetric\tMask\n'
+)
+ROUTE_ETH = 'eth0\t00000000\t0102A8C0\t0003\t0\t{use}\t100\t00000000\n'
+ROUTE_WG = 'wg0\t00000000\t00000000\t0001\t0\t0\t50\t00000000\n'
+
+
+class Tracker(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.route = Path(self.tmp.name) / 'route'
+        self.route_files = {str(self.route): (4, 5)}
+        self.write_routes(ROUTE_ETH.format(use=0))
+        self.events = []
+        self.get = mock.patch('trafficcop.utils.get_net_device').start()
+        self.get.return_value = 'eth0'
+        self.get_all = mock.patch('trafficcop.utils.get_net_devices').start()
+        self.get_all.return_value = ['eth0']
+        self.tracker = netdev.DeviceTracker(self.route_files)
+        self.tracker.connect(lambda old, new: self.events.append((old, new)))
+
+    def write_routes(self, *routes):
+        self.route.write_text(ROUTE_HEADER + ''.join(routes))
+
+    def test_counters_ignored(self):
+        self.write_routes(ROUTE_ETH.format(use=42))
+        self.assertEqual(self.tracker.poll(), 'eth0')
+        # Routes are unchanged, so netifaces isn't asked again.
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_route_change(self):
+        self.write_routes(ROUTE_WG, ROUTE_ETH.format(use=0))
+        self.get.return_value = 'wg0'
+        self.get_all.return_value = ['wg0', 'eth0']
+        self.assertEqual(self.tracker.poll(), 'wg0')
+        self.assertEqual(self.tracker.devices, ['wg0', 'eth0'])
+        self.assertEqual(self.events, [('eth0', 'wg0')])
+
+    def test_configured_interfaces(self):
+        tracker = netdev.DeviceTracker(self.route_files, ['eth0', 'wlan0'])
+        self.write_routes(ROUTE_WG, ROUTE_ETH.format(use=0))
+        tracker.poll()
+        self.assertEqual(tracker.devices, ['eth0', 'wlan0'])
+
+    def test_route_change_same_device(self):
+        self.write_routes(ROUTE_ETH.format(use=0).replace('100', '600'))
+        self.assertEqual(self.tracker.poll(), 'eth0')
+        self.assertEqual(self.get.call_count, 2)
+        self.assertEqual(self.events, [])
+
+    def tearDown(self):
+        mock.patch.stopall()
+        self.tmp.cleanup()
+        logging.disable(logging.NOTSET)
+
+
+PROC_NET_DEV = (
+    'Inter-|   Receive'
+    '                                                |  Transmit\n'
+    ' face |bytes    packets errs drop fifo frame compressed multicast'
+    '|bytes    packets errs drop fifo colls carrier compressed\n'
+    '    lo: 1000 10 0 0 0 0 0 0 1000 10 0 0 0 0 0 0\n'
+    '  eth0: {rx} 10 0 0 0 0 0 0 {tx} 10 0 0 0 0 0 0\n'
+)
+
+
+class Counters(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sys_dir = Path(self.tmp.name) / 'net'
+        self.proc_file = Path(self.tmp.name) / 'dev'
+        stats = self.sys_dir / 'eth0' / 'statistics'
+        stats.mkdir(parents=True)
+        self.tx = stats / 'tx_bytes'
+        self.rx = stats / 'rx_bytes'
+
+    def write_sys(self, tx, rx):
+        self.tx.write_text(f"{tx}\n")
+        self.rx.write_text(f"{rx}\n")
+
+    def write_proc(self, tx, rx):
+        self.proc_file.write_text(PROC_NET_DEV.format(tx=tx, rx=rx))
+
+    def reader(self, device='eth0'):
+        return netdev.CounterReader(device, self.sys_dir, self.proc_file)
+
+    def test_sysfs(self):
+        self.write_sys(100, 200)
+        reader = self.reader()
+        self.assertEqual(reader.read(), [0, 0])
+        self.write_sys(150, 1200)
+        self.assertEqual(reader.read(), [50, 1000])
+        reader.close()
+
+    def test_proc_fallback(self):
+        self.write_proc(100, 200)
+        reader = self.reader('missing0')
+        reader.device = 'eth0'
+        self.assertEqual(reader.read(), [0, 0])
+        self.write_proc(110, 260)
+        self.assertEqual(reader.read(), [10, 60])
+
+    def test_wraparound_and_reset(self):
+        self.assertEqual(netdev.counter_delta(2**32 - 10, 5, True), 15)
+        self.assertEqual(netdev.counter_delta(1000, 10, True), 10)
+        self.assertEqual(netdev.counter_delta(1000, 10), 10)
+
+    def test_64_bit_reset(self):
+        # A 64-bit counter that went down was reset, not wrapped.
+        self.assertEqual(netdev.counter_delta(10_000_000_000, 100), 100)
+        self.assertEqual(netdev.counter_delta(3_000_000_000, 100), 100)
+        self.assertEqual(netdev.counter_delta(10_000_000_000, 100, True), 100)
+
+    def test_sysfs_reset(self):
+        self.write_sys(3_000_000_000, 10_000_000_000)
+        reader = self.reader()
+        reader.read()
+        self.write_sys(100, 200)
+        self.assertEqual(reader.read(), [100, 200])
+        reader.close()
+
+    def test_proc_wraparound(self):
+        self.write_proc(2**32 - 10, 100)
+        reader = self.reader('missing0')
+        reader.device = 'eth0'
+        reader.read()
+        self.write_proc(5, 150)
+        self.assertEqual(reader.read(), [15, 50])
+
+    def test_device_change(self):
+        self.write_sys(100, 200)
+        reader = self.reader()
+        reader.read()
+        self.write_sys(300, 400)
+        self.assertEqual(reader.read(), [200, 200])
+        # The new device's counters start a new baseline.
+        self.write_proc(5000, 5000)
+        reader.set_device('eth1')
+        self.assertEqual(reader.read(), [200, 200])
+        self.assertEqual(reader.read(), [200, 200])
+
+    def test_no_device(self):
+        self.assertEqual(self.reader(None).read(), [0, 0])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        logging.disable(logging.NOTSET)
+
+
+class Global(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sys_dir = Path(self.tmp.name)
+        self.add_device('eth0', 1)
+        self.add_device('wg0', 65534)
+        self.add_device('tun0', 65534, tun=True)
+
+    def add_device(self, device, dev_type, tun=False):
+        dev_dir = self.sys_dir / device
+        (dev_dir / 'statistics').mkdir(parents=True)
+        (dev_dir / 'type').write_text(f"{dev_type}\n")
+        if tun:
+            (dev_dir / 'tun_flags').write_text('0x1001\n')
+        self.write_counters(device, 0, 0)
+
+    def write_counters(self, device, tx, rx):
+        stats = self.sys_dir / device / 'statistics'
+        (stats / 'tx_bytes').write_text(f"{tx}\n")
+        (stats / 'rx_bytes').write_text(f"{rx}\n")
+
+    def counters(self, devices):
+        return netdev.GlobalCounters(devices, self.sys_dir, '/nonexistent')
+
+    def test_is_tunnel(self):
+        self.assertFalse(netdev.is_tunnel('eth0', self.sys_dir))
+        self.assertTrue(netdev.is_tunnel('wg0', self.sys_dir))
+        self.assertTrue(netdev.is_tunnel('tun0', self.sys_dir))
+        self.assertFalse(netdev.is_tunnel('missing0', self.sys_dir))
+
+    def test_tunnel_not_double_counted(self):
+        counters = self.counters(['eth0', 'wg0'])
+        counters.read()
+        self.write_counters('eth0', 1100, 2200)
+        self.write_counters('wg0', 1000, 2000)
+        self.assertEqual(counters.read(), [1100, 2200])
+        breakdown = counters.breakdown()
+        self.assertEqual(
+            breakdown,
+            {'eth0': [1100, 2200], 'wg0': [1000, 2000]},
+        )
+
+    def test_tunnel_only(self):
+        counters = self.counters(['wg0'])
+        counters.read()
+        self.write_counters('wg0', 10, 20)
+        self.assertEqual(counters.read(), [10, 20])
+
+    def test_device_set_change(self):
+        counters = self.counters(['wg0'])
+        counters.read()
+        self.write_counters('wg0', 10, 20)
+        counters.read()
+        # Adding the underlay device doesn't make the totals go backwards.
+        self.write_counters('eth0', 500, 500)
+        counters.set_devices(['eth0', 'wg0'])
+        self.assertEqual(counters.read(), [10, 20])
+        self.write_counters('eth0', 600, 700)
+        self.assertEqual(counters.read(), [110, 220])
+        counters.set_devices([])
+        self.assertEqual(counters.read(), [110, 220])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        logging.disable(logging.NOTSET)
@@ -0,0 +1,134 @@
+import logging
+import queue
+import threading
+import unittest
+
+from trafficcop import nethogs
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+
+class Lines(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_process_line(self):
+        line = '/usr/lib/firefox/firefox/4321/1000\t1234\t56789'
+        parsed = nethogs.parse_line(line)
+        self.assertEqual(
+            parsed,
+            (4321, '/usr/lib/firefox/firefox', 1234, 56789),
+        )
+
+    def test_exe_with_spaces(self):
+        line = '/opt/My App/bin/my app/99/1000\t1.0\t2.0'
+        parsed = nethogs.parse_line(line)
+        self.assertEqual(parsed, (99, '/opt/My App/bin/my app', 1, 2))
+
+    def test_unknown(self):
+        parsed = nethogs.parse_line('unknown TCP/0/0\t10\t20')
+        self.assertEqual(parsed, (0, 'unknown TCP', 10, 20))
+
+    def test_not_a_process_line(self):
+        self.assertIsNone(nethogs.parse_line('Ready.'))
+        self.assertIsNone(nethogs.parse_line('Adding local address: 10.0.0.2'))
+
+    def tearDown(self):
+        pass
+
+
+class Frames(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.parser = nethogs.FrameParser()
+
+    def test_frames(self):
+        lines = [
+            'Adding local address: 10.0.0.2',
+            'Ready.',
+            'Refreshing:',
+            '/usr/bin/a/1/1000\t10\t20',
+            'unknown TCP/0/0\t1\t2',
+            '',
+            'Refreshing:',
+            '/usr/bin/a/1/1000\t30\t40',
+        ]
+        frames = [self.parser.feed(line + '\n') for line in lines]
+        frames.append(self.parser.flush())
+        frames = [f for f in frames if f]
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(frames[0].pids, (1, 0))
+        self.assertEqual(frames[0].exes, ('/usr/bin/a', 'unknown TCP'))
+        self.assertEqual(frames[0].sent, (10, 1))
+        self.assertEqual(frames[0].recv, (20, 2))
+        self.assertEqual(list(frames[1].lines()), [(1, '/usr/bin/a', 30, 40)])
+        self.assertLessEqual(frames[0].time, frames[1].time)
+
+    def test_empty_frame(self):
+        self.assertIsNone(self.parser.flush())
+        self.parser.feed('Refreshing:')
+        frame = self.parser.flush()
+        self.assertEqual(frame.pids, ())
+        self.assertEqual(list(frame.lines()), [])
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+
+class Queue(unittest.TestCase):
+    def setUp(self):
+        self.q = nethogs.FrameQueue()
+        self.old = nethogs.Frame(1.0, (1, 2), ('/a', '/b'), (10, 5), (20, 6))
+
+    def test_get_empty(self):
+        self.assertTrue(self.q.empty())
+        self.assertRaises(queue.Empty, self.q.get, False)
+        self.assertRaises(queue.Empty, self.q.get, True, 0.01)
+
+    def test_latest_wins(self):
+        new = nethogs.Frame(2.0, (2, 1), ('/b', '/a'), (7, 11), (8, 21))
+        self.q.put(self.old)
+        self.q.put(new)
+        self.assertIs(self.q.get(), new)
+        self.assertTrue(self.q.empty())
+        self.assertEqual((self.q.dropped, self.q.merged), (1, 0))
+
+    def test_merge(self):
+        new = nethogs.Frame(
+            2.0, (1, 0), ('/a', 'unknown TCP'), (11, 1), (21, 1)
+        )
+        self.q.put(self.old)
+        self.q.put(new)
+        frame = self.q.get()
+        self.assertEqual(frame.time, 2.0)
+        self.assertEqual(
+            sorted(frame.lines()),
+            [(0, 'unknown TCP', 1, 1), (1, '/a', 11, 21), (2, '/b', 5, 6)],
+        )
+        self.assertEqual((self.q.dropped, self.q.merged), (0, 1))
+
+    def test_merge_bounded(self):
+        # Processes that only ever show up once while nobody reads.
+        for i in range(100):
+            pid = 100 + i
+            self.q.put(nethogs.Frame(float(i), (pid,), ('/c',), (1,), (1,)))
+        frame = self.q.get()
+        self.assertEqual(frame.pids, (199, 198))
+        self.assertEqual((self.q.dropped, self.q.merged), (0, 99))
+
+    def test_wait(self):
+        self.assertFalse(self.q.wait(timeout=0.01))
+        self.q.put(self.old)
+        self.assertTrue(self.q.wait(timeout=0.01))
+        # Waiting doesn't consume the frame.
+        self.assertFalse(self.q.empty())
+
+    def test_wakes_waiting_reader(self):
+        t = threading.Timer(0.05, self.q.put, args=(self.old,))
+        t.start()
+        self.assertIs(self.q.get(timeout=5), self.old)
+        t.join()
+
+    def tearDown(self):
+        pass
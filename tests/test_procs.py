@@ -0,0 +1,39 @@
+import os
+import unittest
+
+from trafficcop import procs
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+
+class Table(unittest.TestCase):
+    def setUp(self):
+        self.table = procs.ProcessTable()
+
+    def test_get_own_pid(self):
+        info = self.table.get(str(os.getpid()))
+        self.assertEqual(info.pid, os.getpid())
+        self.assertEqual(info.key, (info.pid, info.create_time))
+        # Second lookup comes from the cache.
+        self.assertIs(self.table.get(os.getpid()), info)
+
+    def test_get_nonexistent_pid(self):
+        self.assertIsNone(self.table.get(2**22 + 1))
+
+    def test_refresh_drops_exited(self):
+        info = self.table.get(os.getpid())
+        fake = procs.ProcInfo(2**22 + 1, 0.0, 'gone', '/gone', ['gone'])
+        self.table.procs[fake.pid] = fake
+        dropped = self.table.refresh()
+        self.assertEqual(dropped, [fake.key])
+        self.assertIn(info.pid, self.table.procs)
+
+    def test_refresh_drops_reused_pid(self):
+        info = self.table.get(os.getpid())
+        self.table.procs[info.pid] = info._replace(create_time=0.0)
+        dropped = self.table.refresh()
+        self.assertEqual(dropped, [(info.pid, 0.0)])
+
+    def tearDown(self):
+        pass
@@ -0,0 +1,171 @@
+import logging
+import time
+import unittest
+
+from unittest import mock
+
+from trafficcop import history
+from trafficcop import matcher
+from trafficcop import netdev
+from trafficcop import nethogs
+from trafficcop import procs
+from trafficcop import rates
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+
+class Aggregate(unittest.TestCase):
+    def setUp(self):
+        self.data = rates.new_scope_data()
+
+    def test_sum_of_pids(self):
+        rates.aggregate_scope(self.data, {1: [0, 0], 2: [0, 0]}, 0.0)
+        rates.aggregate_scope(self.data, {1: [100, 1000], 2: [50, 500]}, 1.0)
+        self.assertEqual(self.data['now']['bytes_up'], 150)
+        self.assertEqual(self.data['now']['bytes_dn'], 1500)
+
+    def test_first_totals_are_baseline(self):
+        # A long-running pid's first totals aren't new traffic.
+        rates.aggregate_scope(self.data, {1: [10**9, 10**10]}, 1.0)
+        self.assertEqual(self.data['now']['bytes_up'], 0)
+        self.assertEqual(self.data['now']['bytes_dn'], 0)
+        rates.aggregate_scope(self.data, {1: [10**9 + 5, 10**10 + 7]}, 2.0)
+        self.assertEqual(self.data['now']['bytes_up'], 5)
+        self.assertEqual(self.data['now']['bytes_dn'], 7)
+
+    def test_running_totals(self):
+        rates.aggregate_scope(self.data, {1: [0, 0], 2: [0, 0]}, 0.0)
+        rates.aggregate_scope(self.data, {1: [100, 1000], 2: [50, 500]}, 1.0)
+        self.data['last'] = self.data['now'].copy()
+        # pid 2 is quiet this time; pid 3 is new.
+        rates.aggregate_scope(self.data, {1: [300, 1500], 3: [10, 20]}, 3.0)
+        self.assertEqual(self.data['now']['bytes_up'], 350)
+        self.assertEqual(self.data['now']['bytes_dn'], 2000)
+        self.assertEqual(rates.calculate_data_rates(self.data), [250, 100])
+
+    def test_nethogs_restart(self):
+        rates.aggregate_scope(self.data, {1: [0, 0]}, 0.0)
+        rates.aggregate_scope(self.data, {1: [100, 1000]}, 1.0)
+        rates.aggregate_scope(self.data, {1: [10, 20]}, 2.0)
+        self.assertEqual(self.data['now']['bytes_up'], 110)
+        self.assertEqual(self.data['now']['bytes_dn'], 1020)
+
+    def test_pid_moved_scope(self):
+        scopes = {'Old': self.data, 'New': rates.new_scope_data()}
+        rates.aggregate_scope(self.data, {1: [1000, 2000]}, 1.0)
+        totals = {1: [1100, 2300]}
+        rates.move_pid_baselines(scopes, 'New', totals)
+        rates.aggregate_scope(scopes['New'], totals, 2.0)
+        self.assertEqual(scopes['New']['now']['bytes_up'], 100)
+        self.assertEqual(scopes['New']['now']['bytes_dn'], 300)
+        self.assertEqual(self.data['pids'], {})
+
+    def test_get_pid_totals(self):
+        scopes = {'App': self.data}
+        rates.aggregate_scope(self.data, {1: [100, 1000], 2: [50, 500]}, 1.0)
+        totals = rates.get_pid_totals(scopes, 'App')
+        self.assertEqual(totals, {1: [100, 1000], 2: [50, 500]})
+        self.assertEqual(rates.get_pid_totals(scopes, 'None'), {})
+
+    def tearDown(self):
+        pass
+
+
+class UpdateScopes(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.q = nethogs.FrameQueue()
+        self.matcher = matcher.ScopeMatcher([])
+        self.table = procs.ProcessTable()
+        self.cache = matcher.ScopeCache()
+        self.counters = netdev.GlobalCounters([])
+
+    def update(self, scopes):
+        return rates.update_scopes(
+            scopes,
+            self.q,
+            self.matcher,
+            self.table,
+            self.cache,
+            self.counters,
+        )
+
+    def put_frame(self, *lines):
+        parser = nethogs.FrameParser()
+        parser.feed('Refreshing:')
+        for line in lines:
+            parser.feed(line)
+        self.q.put(parser.flush())
+
+    def test_unknown_tcp(self):
+        self.put_frame('unknown TCP/0/0\t10\t20')
+        scopes = self.update({})
+        self.put_frame('unknown TCP/0/0\t110\t220')
+        scopes = self.update(scopes)
+        self.assertEqual(scopes['unknown TCP']['now']['bytes_up'], 100)
+        self.assertEqual(scopes['unknown TCP']['now']['bytes_dn'], 200)
+        self.assertIn('Global', scopes)
+
+    def test_zero_traffic_skipped(self):
+        self.put_frame('unknown UDP/0/0\t0\t0')
+        scopes = self.update({})
+        self.assertNotIn('unknown UDP', scopes)
+
+    def test_idle_scope_resampled(self):
+        self.put_frame('unknown TCP/0/0\t100\t200')
+        scopes = self.update({})
+        first = scopes['unknown TCP']['now']['time']
+        self.put_frame('unknown UDP/0/0\t10\t20')
+        scopes = self.update(scopes)
+        now = scopes['unknown TCP']['now']
+        self.assertGreater(now['time'], first)
+        self.assertEqual(now['bytes_dn'], 0)
+        data_rates = rates.calculate_data_rates(scopes['unknown TCP'])
+        self.assertEqual(data_rates, [0, 0])
+
+    def test_device_change(self):
+        scopes = self.update({})
+        self.counters.set_devices(['lo'])
+        scopes = self.update(scopes)
+        # The Global totals carry on over the new device.
+        global_rates = rates.get_scope_rates(scopes)['Global']
+        self.assertGreaterEqual(min(global_rates), 0)
+        self.assertIn('Global', rates.get_rates_dict(scopes))
+
+    def test_rates_decay_without_frames(self):
+        rate_history = history.RateHistory(seconds=60, interval=1.0)
+        start = time.monotonic()
+        scopes = {}
+        for i in range(1, 11):
+            with mock.patch('time.monotonic', return_value=start + i):
+                self.put_frame(f"unknown TCP/0/0\t{i * 1000}\t{i * 1000}")
+                scopes = self.update(scopes)
+            rate_history.add_samples(scopes)
+        self.assertGreater(rate_history.get_rates('unknown TCP')[0], 0)
+        # nethogs goes quiet: the scope is still sampled, without traffic.
+        for i in range(11, 100):
+            with mock.patch('time.monotonic', return_value=start + i):
+                scopes = self.update(scopes)
+            rate_history.add_samples(scopes)
+        self.assertEqual(rate_history.get_rates('unknown TCP'), [0.0, 0.0])
+        data = scopes['unknown TCP']
+        self.assertEqual(data['now']['bytes_dn'], 9000)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+
+class Cells(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_format_rate_cells(self):
+        cells = rates.format_rate_cells([12.4, 'KB/s', 0, 'B/s'])
+        self.assertEqual(cells, ['12', 'KB/s', '    ', '    '])
+
+    def test_no_rates(self):
+        self.assertEqual(rates.format_rate_cells(None), ['    '] * 4)
+
+    def tearDown(self):
+        pass
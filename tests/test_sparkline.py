@@ -0,0 +1,46 @@
+import unittest
+
+from trafficcop import history
+from trafficcop import sparkline
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+
+class Renderer(unittest.TestCase):
+    def setUp(self):
+        self.history = history.RateHistory(seconds=120, interval=1.0)
+        self.renderer = sparkline.SparklineRenderer(self.history)
+        self.scope = history.ScopeHistory(self.history.size)
+        self.history.scopes['App'] = self.scope
+
+    def test_flat_key(self):
+        for t in range(5):
+            self.scope.add(float(t), 0, 0)
+        self.assertEqual(self.renderer.get_key(self.scope), 'flat')
+
+    def test_version_key(self):
+        for t in range(5):
+            self.scope.add(float(t), t * 100, 0)
+        version = self.renderer.get_key(self.scope)
+        self.assertEqual(version, self.scope.version)
+        self.scope.add(5.0, 500, 0)
+        self.assertNotEqual(self.renderer.get_key(self.scope), version)
+
+    def test_samples_limited(self):
+        for t in range(100):
+            self.scope.add(float(t), t * 100, t * 10)
+        rates_dn, rates_up = self.renderer.get_samples(self.scope)
+        self.assertEqual(len(rates_dn), sparkline.SAMPLES)
+        self.assertEqual(len(rates_up), sparkline.SAMPLES)
+
+    def test_draw(self):
+        for t in range(10):
+            self.scope.add(float(t), t * 100, t * 10)
+        surface = self.renderer.draw(self.scope)
+        width = sparkline.SAMPLES * sparkline.STEP
+        self.assertEqual(surface.get_width(), width)
+        self.assertEqual(surface.get_height(), sparkline.HEIGHT)
+
+    def tearDown(self):
+        pass
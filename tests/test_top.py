@@ -0,0 +1,109 @@
+import logging
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from pathlib import Path
+
+from trafficcop import collector
+from trafficcop import history
+from trafficcop import model
+from trafficcop import top
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+DATA_DIR = Path(__file__).parent / 'data'
+
+
+def make_stats(scope_rates):
+    return {
+        scope: model.ScopeStats(scope, 0, 0, rate_dn, rate_up)
+        for scope, (rate_dn, rate_up) in scope_rates.items()
+    }
+
+
+class Rows(unittest.TestCase):
+    def setUp(self):
+        self.scope_stats = make_stats({
+            'Zoom': [100, 50],
+            'Global': [10, 10],
+            'Firefox': [2000, 100],
+        })
+
+    def test_order(self):
+        lines = top.format_rows(self.scope_stats)
+        scopes = [line.split()[0] for line in lines[1:]]
+        self.assertEqual(scopes, ['Global', 'Firefox', 'Zoom'])
+
+    def test_format(self):
+        lines = top.format_rows(make_stats({'Firefox': [2048, 0]}))
+        expected = ['Firefox', '2', 'KB/s', '0', 'B/s', '0', 'B/s', '0', 'B/s']
+        self.assertEqual(lines[1].split(), expected)
+
+    def test_peaks(self):
+        history_stats = {'Zoom': history.Stats(0, 0, 0, 0, 5000, 300)}
+        lines = top.format_rows(self.scope_stats, history_stats)
+        zoom = [line.split() for line in lines if line.startswith('Zoom')]
+        self.assertEqual(zoom[0][5:], ['5', 'KB/s', '300', 'B/s'])
+
+    def test_no_gtk(self):
+        code = "import sys; import trafficcop.top; print('gi' in sys.modules)"
+        out = subprocess.run(
+            [sys.executable, '-c', code],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parents[1],
+        )
+        self.assertEqual(out.stdout.strip(), 'False')
+
+    def tearDown(self):
+        pass
+
+
+class FromCollector(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = Path(self.tmp.name) / 'collector.sock'
+        command = [
+            sys.executable,
+            str(DATA_DIR / 'nethogs-stub'),
+            str(DATA_DIR / 'nethogs-trace.txt'),
+            '0.05',
+        ]
+        self.collector = collector.Collector(
+            self.socket_path,
+            DATA_DIR / 'traffic-cop.yaml',
+            interval=0.05,
+            command=command,
+        )
+        self.thread = threading.Thread(
+            target=self.collector.run,
+            daemon=True,
+        )
+        self.thread.start()
+        for i in range(100):
+            if self.socket_path.exists():
+                break
+            time.sleep(0.05)
+
+    def test_rates(self):
+        t = top.Top(socket_path=self.socket_path, interval=0.05)
+        self.assertTrue(t.start())
+        self.assertFalse(t.local)
+        for i in range(100):
+            scope_stats = t.update()
+            if 'unknown TCP' in scope_stats:
+                break
+            time.sleep(0.05)
+        self.assertGreater(scope_stats['unknown TCP'].rate_dn, 0)
+
+    def tearDown(self):
+        self.collector.stop()
+        self.thread.join(5)
+        self.tmp.cleanup()
+        logging.disable(logging.NOTSET)
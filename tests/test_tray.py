@@ -0,0 +1,35 @@
+import unittest
+
+from trafficcop import tray
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+
+class Rates(unittest.TestCase):
+    def setUp(self):
+        self.rates = {
+            'Global': [3000, 300],
+            'Firefox': [2000, 100],
+            'Zoom': [500, 150],
+            'Idle': [0, 0],
+            'Updates': [900, 0],
+        }
+
+    def test_format_rates(self):
+        self.assertEqual(tray.format_rates([2048, 0]), "↓ 2 KB/s  ↑ 0 B/s")
+
+    def test_no_rates(self):
+        self.assertEqual(tray.format_rates(None), "↓ 0 B/s  ↑ 0 B/s")
+
+    def test_top_scopes(self):
+        top = tray.get_top_scopes(self.rates, count=2)
+        self.assertEqual([scope for scope, r in top], ['Firefox', 'Updates'])
+
+    def test_top_scopes_skip_idle(self):
+        top = tray.get_top_scopes(self.rates, count=10)
+        self.assertNotIn('Idle', [scope for scope, r in top])
+        self.assertNotIn('Global', [scope for scope, r in top])
+
+    def tearDown(self):
+        pass
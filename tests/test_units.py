@@ -0,0 +1,66 @@
+import unittest
+
+from trafficcop import units
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+
+class Parse(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_si_and_iec_prefixes(self):
+        self.assertEqual(units.parse_rate('3mbit'), 375000)
+        self.assertEqual(units.parse_rate('100kbps'), 100000)
+        self.assertEqual(units.parse_rate('1kibps'), 1024)
+        self.assertEqual(units.parse_rate('7gibit'), 939524096)
+        self.assertEqual(units.parse_rate('1tbps'), 10**12)
+
+    def test_bare_number_is_bits(self):
+        self.assertEqual(units.parse_rate('8000'), 1000)
+        self.assertEqual(units.parse_rate('8bit'), 1)
+        self.assertEqual(units.parse_rate('8bps'), 8)
+
+    def test_decimals(self):
+        self.assertEqual(units.parse_rate('1.5mbit'), 187500)
+        self.assertEqual(units.parse_rate('.5kbps'), 500)
+        # Whole bytes, rounded down.
+        self.assertEqual(units.parse_rate('4bit'), 0)
+
+    def test_case_insensitive(self):
+        self.assertEqual(units.parse_rate('3Mbit'), 375000)
+        self.assertEqual(units.parse_rate('2KiBps'), 2048)
+
+    def test_percent(self):
+        self.assertTrue(units.is_percent('10%'))
+        rate = units.parse_rate('10%', link_rate=125000000)
+        self.assertEqual(rate, 12500000)
+        with self.assertRaises(ValueError):
+            units.parse_rate('10%')
+
+    def test_invalid(self):
+        for text in ['', 'fast', '3mb', '3 kilobit', '-1kbit', '1.2.3bit']:
+            with self.assertRaises(ValueError):
+                units.parse_rate(text)
+
+    def tearDown(self):
+        pass
+
+
+class Format(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_format_bytes(self):
+        self.assertEqual(units.format_bytes(999), [999, 'B/s'])
+        self.assertEqual(units.format_bytes(1500), [1.5, 'KB/s'])
+        self.assertEqual(units.format_bytes(2.5e9), [2.5, 'GB/s'])
+
+    def test_format_rate(self):
+        self.assertEqual(units.format_rate('1.5mbit'), ('188', 'KB/s'))
+        self.assertEqual(units.format_rate('3mibps'), ('3', 'MB/s'))
+        self.assertEqual(units.format_rate('12.5%'), ('12.5', '%'))
+
+    def tearDown(self):
+        pass
@@ -1,5 +1,7 @@
+import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 from trafficcop import utils
 
@@ -22,6 +24,42 @@ class Misc(unittest.TestCase):
     def tearDown(self):
         pass
 
+class Digest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        tmp = Path(self.tmp_dir.name)
+        self.a = tmp / 'a.yaml'
+        self.b = tmp / 'b.yaml'
+        self.a.write_text('download: 3mbit\n')
+        self.b.write_text('download: 3mbit\n')
+
+    def test_same_content(self):
+        a = utils.FileDigest(self.a)
+        self.assertTrue(a.matches(utils.FileDigest(self.b)))
+
+    def test_recomputed_on_change(self):
+        a = utils.FileDigest(self.a)
+        b = utils.FileDigest(self.b)
+        self.assertTrue(a.matches(b))
+        self.a.write_text('download: 4mbit\n')
+        self.assertFalse(a.matches(b))
+
+    def test_not_reread_if_unchanged(self):
+        a = utils.FileDigest(self.a)
+        digest = a.digest
+        with mock.patch.object(Path, 'read_bytes') as read_bytes:
+            self.assertEqual(a.digest, digest)
+        read_bytes.assert_not_called()
+
+    def test_missing_file(self):
+        missing = utils.FileDigest(self.a.with_name('missing.yaml'))
+        self.assertIsNone(missing.digest)
+        self.assertFalse(missing.matches(missing))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
 class Timestamps(unittest.TestCase):
     def setUp(self):
         self.convert = utils.convert_human_to_epoch
@@ -0,0 +1,111 @@
+import logging
+import os
+import time
+import unittest
+
+from types import SimpleNamespace
+from unittest import mock
+
+from gi.repository import GLib
+
+from trafficcop import nethogs
+from trafficcop import watch
+
+# Assert*() methods here:
+# https://docs.python.org/3/library/unittest.html?highlight=pytest#unittest.TestCase
+
+
+class Nethogs(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.app = SimpleNamespace(
+            net_hogs_q=nethogs.FrameQueue(),
+            refresh_interval=1.0,
+            window=SimpleNamespace(is_visible=lambda: True),
+        )
+        self.watch = watch.NethogsWatch(self.app)
+        self.watch.update = mock.Mock()
+        # Stand-in for nethogs' stdout.
+        read_fd, self.write_fd = os.pipe()
+        os.set_blocking(read_fd, False)
+        self.stdout = os.fdopen(read_fd, 'rb')
+        self.watch.proc = SimpleNamespace(stdout=self.stdout)
+
+    def output(self, data):
+        os.write(self.write_fd, data)
+        return self.watch.on_output(None, GLib.IOCondition.IN)
+
+    def frames(self):
+        frames = []
+        while not self.app.net_hogs_q.empty():
+            frames.append(self.app.net_hogs_q.get(block=False))
+        return frames
+
+    def test_lines_split_across_reads(self):
+        self.assertTrue(self.output(b'Refreshing:\nunknown TCP/0/0\t1'))
+        self.assertEqual(self.watch.buffer, b'unknown TCP/0/0\t1')
+        self.output(b'00\t200\n')
+        self.watch.on_quiet()
+        frame, = self.frames()
+        self.assertEqual(list(frame.lines()), [(0, 'unknown TCP', 100, 200)])
+
+    def test_next_refresh_completes_frame(self):
+        self.output(b'Refreshing:\nunknown TCP/0/0\t100\t200\n')
+        self.assertEqual(self.frames(), [])
+        self.output(b'Refreshing:\nunknown UDP/0/0\t10\t20\n')
+        frame, = self.frames()
+        self.assertEqual(frame.exes, ('unknown TCP',))
+
+    def test_quiet_flushes_frame(self):
+        self.output(b'Refreshing:\nunknown TCP/0/0\t100\t200\n')
+        # Each read restarts the quiet timer.
+        self.assertIsNotNone(self.watch.flush_id)
+        self.assertFalse(self.watch.on_quiet())
+        self.assertIsNone(self.watch.flush_id)
+        frame, = self.frames()
+        self.assertEqual(frame.pids, (0,))
+        # Nothing more to flush.
+        self.watch.on_quiet()
+        self.assertEqual(self.frames(), [])
+
+    def test_startup_output_ignored(self):
+        self.output(b'Adding local address: 10.0.0.2\nReady.\n')
+        self.watch.on_quiet()
+        self.assertEqual(self.frames(), [])
+
+    def test_nethogs_exit(self):
+        os.close(self.write_fd)
+        self.write_fd = None
+        self.watch.reap = mock.Mock()
+        self.assertFalse(self.watch.on_output(None, GLib.IOCondition.HUP))
+        self.assertIsNone(self.watch.watch_id)
+        # Reaped later, without waiting on the main loop.
+        self.watch.reap.assert_called_once_with(self.watch.proc)
+
+    def test_update_throttled(self):
+        frame = nethogs.Frame(time.monotonic(), (), (), (), ())
+        self.watch.last_update = time.monotonic()
+        self.watch.on_frame(frame)
+        self.watch.update.assert_not_called()
+        self.assertIsNotNone(self.watch.update_id)
+        # Frames before the scheduled update only go to the queue.
+        update_id = self.watch.update_id
+        self.watch.on_frame(frame)
+        self.assertEqual(self.watch.update_id, update_id)
+        self.watch.update.assert_not_called()
+
+    def test_update_when_due(self):
+        frame = nethogs.Frame(time.monotonic(), (), (), (), ())
+        self.watch.last_update = time.monotonic() - 1.5
+        self.watch.on_frame(frame)
+        self.watch.update.assert_called_once_with()
+        self.assertIsNone(self.watch.update_id)
+
+    def tearDown(self):
+        for source_id in [self.watch.flush_id, self.watch.update_id]:
+            if source_id:
+                GLib.source_remove(source_id)
+        self.stdout.close()
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+        logging.disable(logging.NOTSET)
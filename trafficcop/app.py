@@ -3,7 +3,6 @@
 import gi
 import logging
 import os
-import queue
 # import subprocess
 import sys
 import threading
@@ -16,9 +15,20 @@ from gi.repository import Gio       # noqa: E402
 from gi.repository import GLib      # noqa: E402
 from gi.repository import Gtk       # noqa: E402
 
+from . import client                # noqa: E402
 from . import config                # noqa: E402
 from . import handler               # noqa: E402
+from . import history               # noqa: E402
+from . import hotapply              # noqa: E402
+from . import matcher               # noqa: E402
+from . import model                 # noqa: E402
+from . import nethogs               # noqa: E402
+from . import netdev                # noqa: E402
+from . import procs                 # noqa: E402
+from . import sparkline             # noqa: E402
+from . import store                 # noqa: E402
 from . import utils                 # noqa: E402
+from . import watch                 # noqa: E402
 from . import worker                # noqa: E402
 
 
@@ -43,6 +53,37 @@ class TrafficCop(Gtk.Application):
             'reset', ord('r'), GLib.OptionFlags.NONE, GLib.OptionArg.NONE,
             'Reset config file to default.', None
         )
+        self.add_main_option(
+            'interval', ord('i'), GLib.OptionFlags.NONE,
+            GLib.OptionArg.DOUBLE,
+            'Minimum seconds between rate updates (default: 1).', 'SECONDS'
+        )
+        self.add_main_option(
+            'history', ord('H'), GLib.OptionFlags.NONE, GLib.OptionArg.INT,
+            'Seconds of rate history kept for each scope (default: 600).',
+            'SECONDS'
+        )
+        self.add_main_option(
+            'interfaces', ord('I'), GLib.OptionFlags.NONE,
+            GLib.OptionArg.STRING,
+            'Comma-separated devices counted in Global (default: all'
+            ' gateway devices).', 'IFACES'
+        )
+        self.add_main_option(
+            'socket', 0, GLib.OptionFlags.NONE, GLib.OptionArg.STRING,
+            'Socket of the collector to get rates from (default: the'
+            ' running one, if any).', 'PATH'
+        )
+        self.add_main_option(
+            'sparklines', ord('s'), GLib.OptionFlags.NONE,
+            GLib.OptionArg.NONE,
+            'Show a graph of the recent rates of each scope.', None
+        )
+        self.add_main_option(
+            'io-watch', ord('w'), GLib.OptionFlags.NONE, GLib.OptionArg.NONE,
+            'Read nethogs output on the main loop instead of in threads.',
+            None
+        )
 
         # Get UI location based on current file location.
         self.ui_dir = '/usr/share/traffic-cop/ui'
@@ -58,11 +99,24 @@ class TrafficCop(Gtk.Application):
         self.config_file = Path('/etc/traffic-cop.yaml')
         cfg = Path("/usr/share/traffic-cop/traffic-cop.yaml.default")
         self.default_config = cfg
+        self.config_digest = utils.FileDigest(self.config_file)
+        self.default_digest = utils.FileDigest(self.default_config)
+        self.applied_digest = utils.FileDigest(hotapply.APPLIED_FILE)
         self.config_store = ''
-        self.net_hogs_q = queue.Queue()
+        # Snapshot of the config used by the worker; the store is its view.
+        self.config_model = model.ConfigModel()
+        self.net_hogs_q = nethogs.FrameQueue()
         self.main_pid = os.getpid()
         self.managed_ports = {}
         self.scopes = {}
+        self.proc_table = procs.ProcessTable()
+        self.scope_cache = matcher.ScopeCache()
+        self.refresh_interval = 1.0
+        self.history_seconds = history.HISTORY_SECONDS
+        self.rate_history = None
+        self.sparklines = None
+        self.socket_path = None
+        self.interfaces = None
 
     def do_startup(self):
         '''
@@ -117,6 +171,25 @@ class TrafficCop(Gtk.Application):
         if 'debug' in self.options:
             self.log_level = logging.DEBUG
 
+        if 'interval' in self.options:
+            self.refresh_interval = self.options.get('interval')
+
+        if 'history' in self.options:
+            self.history_seconds = self.options.get('history')
+        self.rate_history = history.RateHistory(
+            self.history_seconds,
+            self.refresh_interval,
+        )
+        if 'sparklines' in self.options:
+            self.sparklines = sparkline.SparklineRenderer(self.rate_history)
+
+        if 'interfaces' in self.options:
+            ifaces = self.options.get('interfaces').split(',')
+            self.interfaces = [i.strip() for i in ifaces if i.strip()]
+
+        if 'socket' in self.options:
+            self.socket_path = self.options.get('socket')
+
         # Start logging.
         utils.set_up_logging(self.log_level)
         logging.info("Traffic-Cop started.")
@@ -166,15 +239,49 @@ class TrafficCop(Gtk.Application):
         self.treeview_config.show()
         self.vp_config.add(self.treeview_config)
 
+        # Follow edits of the config file, and of the copy the service uses.
+        self.config_watch = watch.FileWatch(
+            self.config_file,
+            self.on_config_changed,
+        )
+        self.config_watch.start()
+        self.applied_watch = watch.FileWatch(
+            hotapply.APPLIED_FILE,
+            self.update_button_states,
+        )
+        self.applied_watch.start()
+
         # Update widgets and show window.
         self.update_info_widgets()
         self.window.show()
+        elapsed, rss = utils.get_startup_stats()
+        logging.info(f"Window shown in {elapsed:.2f} s; peak RSS: {rss} KiB")
 
         # Start tracking operations (self.window must be shown first).
+        self.device_tracker = netdev.DeviceTracker(interfaces=self.interfaces)
+        devices = self.device_tracker.devices
+        self.global_counters = netdev.GlobalCounters(devices)
+        sock = client.connect(self.socket_path)
+        if sock:
+            # A collector already runs nethogs; show its rates.
+            self.collector_watch = watch.CollectorWatch(self, sock)
+            self.collector_watch.start()
+        else:
+            self.start_sniffing()
+
+    def start_sniffing(self):
+        if 'io-watch' in self.options:
+            # Read nethogs output and update rates on the main loop.
+            self.nethogs_watch = watch.NethogsWatch(self)
+            self.nethogs_watch.start()
+        else:
+            self.start_threads()
+
+    def start_threads(self):
         self.t_nethogs = threading.Thread(
             name='T-nh',
-            target=worker.parse_nethogs_to_queue,
-            args=(self.net_hogs_q,),
+            target=nethogs.read_to_queue,
+            args=(self.net_hogs_q, self.device_tracker),
             daemon=True,
         )
         self.t_nethogs.start()
@@ -216,25 +323,60 @@ class TrafficCop(Gtk.Application):
         # logging.debug(f"Updated config time: {self.tt_start}")
 
     def update_button_states(self):
-        # TODO: I need a way to "watch" the config file if setting the "Apply"
-        #   button to "sensitive" is ever going to work.
-        # Update "Apply" button to be insensitive.
-        # self.button_apply.set_sensitive(False)
         # Update "Reset..." button to be insensitive.
         self.button_reset.set_sensitive(False)
 
-        # Set "Apply" button to proper state.
-        # config_mtime = utils.get_file_mtime(self.config_file)
-        # if self.tt_start and config_mtime > self.tt_start:
-        #     Update "Apply" button to be sensitive.
-        #     self.button_apply.set_sensitive(True)
+        # Set "Apply" button to proper state; the config file and the applied
+        # copy are watched, so this stays current.
+        self.button_apply.set_sensitive(not self.is_config_applied())
 
         # Set "Reset..." button to proper state.
-        diff_configs = utils.check_diff(self.config_file, self.default_config)
-        if not diff_configs == 0:
+        if not self.is_default_config:
             # Update "Reset..." button to be sensitive.
             self.button_reset.set_sensitive(True)
 
+    @property
+    def is_default_config(self):
+        '''
+        True if the config file has the same content as the default config.
+        '''
+        return self.config_digest.matches(self.default_digest)
+
+    def is_config_applied(self):
+        '''
+        Return False if the service is running with other config than what's
+        in the config file now.
+        '''
+        if not self.tt_start:
+            return True
+        if self.applied_digest.digest:
+            return self.config_digest.matches(self.applied_digest)
+        # Started by an older tt-wrapper that doesn't keep a copy.
+        config_mtime = utils.get_file_mtime(self.config_file)
+        config_epoch = utils.convert_human_to_epoch(config_mtime)
+        tt_epoch = utils.convert_human_to_epoch(self.tt_start)
+        return config_epoch <= tt_epoch
+
+    def on_config_changed(self):
+        '''
+        Show the edited config file, without applying it.
+        '''
+        try:
+            content = config.load_config(self.config_file)
+        except config.ConfigError as e:
+            # Possibly saved half-way; wait for the next change.
+            logging.error(e)
+            self.update_button_states()
+            return
+        new_config_model = model.ConfigModel.from_content(content)
+        if self.config_store:
+            self.config_store = store.apply_model(
+                self.config_store,
+                new_config_model,
+            )
+            self.config_model = new_config_model
+        self.update_button_states()
+
     def update_treeview_config(self):
         '''
         This handles both initial config display and updating the display if
@@ -242,34 +384,41 @@ class TrafficCop(Gtk.Application):
         '''
         if not self.config_store:
             # App is just starting up; create the store.
-            self.config_store = config.convert_yaml_to_store(self.config_file)
+            self.config_store = store.convert_yaml_to_store(self.config_file)
+            if self.config_store:
+                self.config_model = self.config_store.model
 
         if self.tt_start:
             # Service is running.
             # Check if modified time of config file is newer than last service
-            # restart.
+            # restart or hot-apply.
             #   The config could have been externally modified. If so, those
             #   changes could be shown here in the app without them actually
             #   having been applied.
-            config_mtime = utils.get_file_mtime(self.config_file)
-            config_epoch = utils.convert_human_to_epoch(config_mtime)
-            tt_epoch = utils.convert_human_to_epoch(self.tt_start)
-            if config_epoch > tt_epoch:
+            if not self.is_config_applied():
                 logging.warning(
                     "The config file has been modified since the service"
                     "started.\nApplying the changes now."
                 )
-                self.restart_service()
-                return config.create_config_treeview(self.config_store)
+                self.apply_config()
+                return store.create_config_treeview(
+                    self.config_store,
+                    self.sparklines,
+                )
 
-        new_config_store = config.convert_yaml_to_store(self.config_file)
-        self.config_store = config.update_config_store(
+        new_config_model = model.load_config(self.config_file)
+        if new_config_model and self.config_store:
+            self.config_store = store.apply_model(
+                self.config_store,
+                new_config_model,
+            )
+            self.config_model = new_config_model
+
+        return store.create_config_treeview(
             self.config_store,
-            new_config_store,
+            self.sparklines,
         )
 
-        return config.create_config_treeview(self.config_store)
-
     def update_info_widgets(self):
         self.update_service_props()
         self.update_state_toggles()
@@ -297,6 +446,24 @@ class TrafficCop(Gtk.Application):
         self.treeview_config = self.update_treeview_config()
         return True
 
+    def apply_config(self):
+        '''
+        Apply the config file to the running service, changing its tc classes
+        in place if possible so that shaping isn't interrupted.
+        '''
+        cmd = ["pkexec", "/usr/bin/traffic-cop", "--hot-apply"]
+        rc = utils.run_command(cmd)
+        if rc == 126:
+            # Authentication was dismissed.
+            return False
+        if rc != hotapply.NEEDS_RESTART and rc != 0:
+            logging.warning(f"Hot-apply failed ({rc}); restarting service.")
+        if rc != 0:
+            return self.restart_service()
+        self.update_info_widgets()
+        self.treeview_config = self.update_treeview_config()
+        return True
+
     def restart_service(self):
         cmd = ["pkexec", "systemctl", "restart", "traffic-cop.service"]
         rc = utils.run_command(cmd)
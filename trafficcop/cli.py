@@ -0,0 +1,24 @@
+""" Command-line entry point. """
+
+import sys
+
+
+def main():
+    # The collector runs headless, so it mustn't import GTK.
+    if '--collector' in sys.argv[1:]:
+        from . import collector
+        sys.exit(collector.main(sys.argv[1:]))
+    # Run as root by pkexec, which has no display.
+    if '--hot-apply' in sys.argv[1:]:
+        from . import hotapply
+        sys.exit(hotapply.main(sys.argv[1:]))
+    # The terminal view must work without a display.
+    if '--top' in sys.argv[1:]:
+        from . import top
+        sys.exit(top.main(sys.argv[1:]))
+    # The tray stays small by not importing the full app.
+    if '--tray' in sys.argv[1:]:
+        from . import tray
+        sys.exit(tray.main(sys.argv[1:]))
+    from . import app
+    app.main()
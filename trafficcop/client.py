@@ -0,0 +1,129 @@
+""" Client side of the collector's Unix socket. """
+
+import json
+import logging
+import os
+import socket
+
+from pathlib import Path
+
+# Socket of a collector run by root, e.g. as a system service.
+SYSTEM_SOCKET = '/run/traffic-cop/collector.sock'
+
+
+def user_socket_path():
+    default = f"/run/user/{os.getuid()}"
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR', default)
+    return Path(runtime_dir) / 'traffic-cop' / 'collector.sock'
+
+
+def default_socket_path():
+    if os.geteuid() == 0:
+        return Path(SYSTEM_SOCKET)
+    return user_socket_path()
+
+
+def connect(path=None):
+    '''
+    Return a socket connected to a running collector, or None. Without a path,
+    the user's own collector is preferred over the system one.
+    '''
+    paths = [path] if path else [user_socket_path(), SYSTEM_SOCKET]
+    for p in paths:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(str(p))
+        except OSError:
+            sock.close()
+            continue
+        logging.debug(f"Connected to collector at {p}")
+        return sock
+    return None
+
+
+class SnapshotReader():
+    '''
+    Split the stream of a collector connection into snapshot dicts.
+    '''
+    def __init__(self):
+        self.buffer = b''
+
+    def feed(self, data):
+        '''
+        Return the list of snapshots completed by the given data.
+        '''
+        *lines, self.buffer = (self.buffer + data).split(b'\n')
+        snapshots = []
+        for line in lines:
+            if not line:
+                continue
+            try:
+                snapshots.append(json.loads(line))
+            except ValueError as e:
+                logging.warning(f"Invalid snapshot from collector: {e}")
+        return snapshots
+
+
+def subscribe(path=None, timeout=None):
+    '''
+    Yield each snapshot published by a running collector until it stops.
+    Raise ConnectionRefusedError if there is no collector.
+    '''
+    sock = connect(path)
+    if not sock:
+        raise ConnectionRefusedError(f"No collector at {path or 'default'}")
+    sock.settimeout(timeout)
+    reader = SnapshotReader()
+    with sock:
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                return
+            yield from reader.feed(data)
+
+
+class Subscription():
+    '''
+    Non-blocking connection to a collector for clients that poll: latest()
+    returns the newest snapshot since the last call. If there is no collector,
+    or it stops, each call tries to connect again.
+    '''
+    def __init__(self, path=None):
+        self.path = path
+        self.sock = None
+        self.reader = SnapshotReader()
+
+    @property
+    def connected(self):
+        return self.sock is not None
+
+    def latest(self):
+        '''
+        Return the newest snapshot from the collector, or None.
+        '''
+        if not self.sock:
+            self.sock = connect(self.path)
+            if not self.sock:
+                return None
+            logging.info("Getting rates from the collector.")
+            self.sock.setblocking(False)
+            self.reader = SnapshotReader()
+        snapshots = []
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b''
+            if not data:
+                logging.warning("The collector stopped.")
+                self.close()
+                break
+            snapshots.extend(self.reader.feed(data))
+        return snapshots[-1] if snapshots else None
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
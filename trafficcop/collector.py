@@ -0,0 +1,398 @@
+""" Headless collector that publishes rate snapshots to clients. """
+
+import argparse
+import json
+import logging
+import os
+import selectors
+import shlex
+import signal
+import socket
+import subprocess
+import time
+import yaml
+
+from pathlib import Path
+
+from . import client
+from . import config
+from . import history
+from . import matcher
+from . import netdev
+from . import nethogs
+from . import procs
+from . import rates
+from . import utils
+
+# Seconds without new output after which a nethogs refresh is complete.
+FRAME_QUIET = 0.1
+# Longest wait in the main loop, so that stop() takes effect soon.
+MAX_WAIT = 0.5
+
+
+def make_snapshot(scopes, rate_history, device):
+    '''
+    Return the JSON-able state published to clients: the 'now' entry of each
+    scope (for clients that keep their own history) and the smoothed
+    [rate_dn, rate_up] of each scope (for clients that just show them).
+    '''
+    now = {
+        scope: data['now'] for scope, data in scopes.items()
+        if data['now'] and None not in data['now'].values()
+    }
+    smoothed = {}
+    for scope in now:
+        scope_rates = rate_history.get_rates(scope)
+        if scope_rates:
+            smoothed[scope] = scope_rates
+    return {
+        'time': time.monotonic(),
+        'device': device,
+        'devices': scopes.get('Global', {}).get('devices', {}),
+        'scopes': now,
+        'rates': smoothed,
+    }
+
+
+class Collector():
+    '''
+    Owner of the one nethogs process, the scope matching and the rates, which
+    are published as JSON-line snapshots to every client of a Unix socket.
+    Everything runs in one thread around a selector. A client that can't keep
+    up misses snapshots instead of having them pile up.
+    '''
+    def __init__(
+        self,
+        socket_path=None,
+        config_file=config.CONFIG_FILE,
+        interval=1.0,
+        interfaces=None,
+        history_seconds=history.HISTORY_SECONDS,
+        command=None,
+    ):
+        self.socket_path = Path(socket_path or client.default_socket_path())
+        self.config_file = Path(config_file)
+        self.config_mtime = None
+        self.interval = interval
+        # Command run instead of nethogs, e.g. to replay a trace.
+        self.command = command
+        self.matcher = matcher.ScopeMatcher([])
+        self.queue = nethogs.FrameQueue()
+        self.proc_table = procs.ProcessTable()
+        self.scope_cache = matcher.ScopeCache()
+        self.rate_history = history.RateHistory(history_seconds, interval)
+        self.device_tracker = netdev.DeviceTracker(interfaces=interfaces)
+        self.device_tracker.connect(self.on_device_changed)
+        devices = self.device_tracker.devices
+        self.global_counters = netdev.GlobalCounters(devices)
+        self.scopes = {}
+        self.selector = selectors.DefaultSelector()
+        self.server = None
+        # {client socket: bytes not yet sent}
+        self.clients = {}
+        self.skipped = 0
+        self.proc = None
+        self.parser = nethogs.FrameParser()
+        self.buffer = b''
+        self.flush_at = None
+        self.update_at = None
+        self.last_update = 0
+        self.running = False
+
+    def listen(self):
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            sock = client.connect(self.socket_path)
+            if sock:
+                sock.close()
+                msg = f"Collector already running at {self.socket_path}"
+                raise RuntimeError(msg)
+            # Left over from a collector that didn't exit cleanly.
+            self.socket_path.unlink()
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(str(self.socket_path))
+        # Any local user may watch the rates, as with the GUI.
+        os.chmod(self.socket_path, 0o666)
+        self.server.listen()
+        self.server.setblocking(False)
+        self.selector.register(
+            self.server,
+            selectors.EVENT_READ,
+            self.on_connect,
+        )
+        logging.info(f"Collector listening at {self.socket_path}")
+
+    def on_connect(self, server, events):
+        conn, addr = server.accept()
+        conn.setblocking(False)
+        self.clients[conn] = b''
+        self.selector.register(conn, selectors.EVENT_READ, self.on_client)
+        logging.info(f"Collector clients: {len(self.clients)}")
+
+    def on_client(self, conn, events):
+        if events & selectors.EVENT_READ:
+            # Clients don't send anything; reading only detects hang-ups.
+            try:
+                data = conn.recv(4096)
+            except OSError:
+                data = b''
+            if not data:
+                self.close_client(conn)
+                return
+        if events & selectors.EVENT_WRITE:
+            self.send(conn)
+
+    def close_client(self, conn):
+        self.selector.unregister(conn)
+        conn.close()
+        del self.clients[conn]
+        logging.info(f"Collector clients: {len(self.clients)}")
+
+    def send(self, conn):
+        pending = self.clients[conn]
+        try:
+            sent = conn.send(pending)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self.close_client(conn)
+            return
+        self.clients[conn] = pending[sent:]
+        events = selectors.EVENT_READ
+        if self.clients[conn]:
+            events |= selectors.EVENT_WRITE
+        self.selector.modify(conn, events, self.on_client)
+
+    def publish(self, snapshot):
+        line = (json.dumps(snapshot, separators=(',', ':')) + '\n').encode()
+        for conn, pending in list(self.clients.items()):
+            if pending:
+                # Still sending an older snapshot.
+                self.skipped += 1
+                continue
+            self.clients[conn] = line
+            self.send(conn)
+
+    def start_nethogs(self):
+        cmd = self.command
+        if not cmd:
+            device = self.device_tracker.device
+            if not device:
+                # No current connection; wait for a device change.
+                return
+            cmd = nethogs.build_command(device)
+        self.parser = nethogs.FrameParser()
+        self.buffer = b''
+        self.proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        os.set_blocking(self.proc.stdout.fileno(), False)
+        self.selector.register(
+            self.proc.stdout,
+            selectors.EVENT_READ,
+            self.on_output,
+        )
+
+    def stop_nethogs(self):
+        if not self.proc:
+            return
+        self.selector.unregister(self.proc.stdout)
+        if self.command:
+            if self.proc.poll() is None:
+                self.proc.terminate()
+        else:
+            nethogs.stop(self.proc)
+        self.proc.wait()
+        self.proc.stdout.close()
+        self.proc = None
+
+    def on_device_changed(self, old, new):
+        if self.command:
+            return
+        logging.info(f"Restarting nethogs on device: {new}")
+        self.stop_nethogs()
+        self.start_nethogs()
+
+    def on_output(self, stdout, events):
+        try:
+            data = os.read(stdout.fileno(), 65536)
+        except BlockingIOError:
+            return
+        if not data:
+            logging.warning(f"nethogs exited: {self.proc.wait()}")
+            self.selector.unregister(stdout)
+            stdout.close()
+            self.proc = None
+            self.flush_at = time.monotonic()
+            return
+        *lines, self.buffer = (self.buffer + data).split(b'\n')
+        for line in lines:
+            frame = self.parser.feed(line.decode('utf-8', errors='replace'))
+            if frame:
+                self.on_frame(frame)
+        # nethogs doesn't mark the end of a refresh, so consider it complete
+        # once the output has been quiet for a moment.
+        self.flush_at = time.monotonic() + FRAME_QUIET
+
+    def on_frame(self, frame):
+        self.queue.put(frame)
+        due = self.last_update + self.interval
+        if not self.update_at or due < self.update_at:
+            self.update_at = due
+
+    def reload_config(self):
+        try:
+            mtime = self.config_file.stat().st_mtime
+        except OSError as e:
+            logging.error(e)
+            return
+        if mtime == self.config_mtime:
+            return
+        self.config_mtime = mtime
+        try:
+            self.matcher = config.load_matcher(self.config_file)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            logging.error(f"Keeping the previous config: {e}")
+            return
+        logging.info(f"Loaded config from {self.config_file}")
+
+    def update(self):
+        self.update_at = None
+        self.last_update = time.monotonic()
+        self.device_tracker.poll()
+        self.global_counters.set_devices(self.device_tracker.devices)
+        self.reload_config()
+        self.scopes = rates.update_scopes(
+            self.scopes,
+            self.queue,
+            self.matcher,
+            self.proc_table,
+            self.scope_cache,
+            self.global_counters,
+        )
+        self.rate_history.add_samples(self.scopes)
+        self.publish(
+            make_snapshot(
+                self.scopes,
+                self.rate_history,
+                self.device_tracker.device,
+            )
+        )
+
+    def get_timeout(self, now):
+        deadlines = [self.last_update + nethogs.FRAME_TIMEOUT, now + MAX_WAIT]
+        for deadline in [self.flush_at, self.update_at]:
+            if deadline:
+                deadlines.append(deadline)
+        return max(min(deadlines) - now, 0)
+
+    def run(self):
+        self.listen()
+        self.running = True
+        self.start_nethogs()
+        try:
+            while self.running:
+                timeout = self.get_timeout(time.monotonic())
+                for key, events in self.selector.select(timeout):
+                    key.data(key.fileobj, events)
+                now = time.monotonic()
+                if self.flush_at and now >= self.flush_at:
+                    self.flush_at = None
+                    frame = self.parser.flush()
+                    if frame:
+                        self.on_frame(frame)
+                if (
+                    self.update_at and now >= self.update_at or
+                    now - self.last_update >= nethogs.FRAME_TIMEOUT
+                ):
+                    self.update()
+        finally:
+            self.close()
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        self.stop_nethogs()
+        for conn in list(self.clients):
+            self.close_client(conn)
+        if self.server:
+            self.selector.unregister(self.server)
+            self.server.close()
+            self.server = None
+            self.socket_path.unlink(missing_ok=True)
+        logging.info(f"Collector stopped; {self.skipped} snapshots skipped.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='traffic-cop --collector',
+        description="Run nethogs and publish the rates of each scope to"
+        " Traffic Cop clients over a Unix socket.",
+    )
+    parser.add_argument(
+        '--collector', action='store_true',
+        help=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        '-d', '--debug', action='store_true',
+        help="Print DEBUG info to stdout.",
+    )
+    parser.add_argument(
+        '-i', '--interval', type=float, default=1.0, metavar='SECONDS',
+        help="Minimum seconds between rate updates (default: 1).",
+    )
+    parser.add_argument(
+        '-I', '--interfaces', metavar='IFACES',
+        help="Comma-separated devices counted in Global (default: all"
+        " gateway devices).",
+    )
+    parser.add_argument(
+        '-H', '--history', type=int, default=history.HISTORY_SECONDS,
+        metavar='SECONDS',
+        help="Seconds of rate history kept for each scope (default: 600).",
+    )
+    parser.add_argument(
+        '--socket', metavar='PATH',
+        help="Socket to listen on (default:"
+        f" {client.default_socket_path()}).",
+    )
+    parser.add_argument(
+        '--config', default=config.CONFIG_FILE, metavar='FILE',
+        help="Config file to match scopes by (default:"
+        f" {config.CONFIG_FILE}).",
+    )
+    parser.add_argument(
+        '--nethogs', metavar='CMD',
+        help="Command to run instead of nethogs, e.g. one that replays a"
+        " recorded trace.",
+    )
+    args = parser.parse_args(argv)
+
+    log_level = logging.DEBUG if args.debug else logging.INFO
+    utils.set_up_logging(log_level)
+    interfaces = None
+    if args.interfaces:
+        ifaces = args.interfaces.split(',')
+        interfaces = [i.strip() for i in ifaces if i.strip()]
+    command = shlex.split(args.nethogs) if args.nethogs else None
+
+    collector = Collector(
+        args.socket,
+        args.config,
+        args.interval,
+        interfaces,
+        args.history,
+        command,
+    )
+    signal.signal(signal.SIGTERM, lambda signum, frame: collector.stop())
+    try:
+        collector.run()
+    except KeyboardInterrupt:
+        pass
+    except (OSError, RuntimeError) as e:
+        logging.error(e)
+        return 1
+    return 0
@@ -1,97 +1,50 @@
-import gi
+""" Reading and validation of the config file. """
+
 import logging
-import re
 import schema
 import subprocess
 import yaml
 
-gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk       # noqa: E402
-from pathlib import Path            # noqa: E402
+from . import matcher
+from . import units
 
 
 VERSION = '1.2.12'
 
-
-def create_config_treeview(store):
-    tree = Gtk.TreeView(model=store)
-    r_left = Gtk.CellRendererText()
-    r_left.set_alignment(0.0, 0.0)
-    r_center = Gtk.CellRendererText()
-    r_center.set_alignment(0.5, 0.0)
-    r_right = Gtk.CellRendererText()
-    r_right.set_alignment(1.0, 0.0)
-
-    # Configure columns.
-    c_name = Gtk.TreeViewColumn("Process", r_left, text=0)
-    c_name.set_sort_column_id(0)
-
-    up = '\u2191'
-    dn = '\u2193'
-    c_dn_max = Gtk.TreeViewColumn(f"Max {dn}", r_right, text=1)
-    c_up_max = Gtk.TreeViewColumn(f"Max {up}", r_right, text=2)
-    c_dn_min = Gtk.TreeViewColumn(f"Min {dn}", r_right, text=3)
-    c_up_min = Gtk.TreeViewColumn(f"Min {up}", r_right, text=4)
-    rates = [c_dn_max, c_up_max, c_dn_min, c_up_min]
-    for r in rates:
-        r.set_fixed_width(80)
-
-    c_dn_pri = Gtk.TreeViewColumn(f"Priority {dn}", r_center, text=5)
-    c_dn_pri.set_sort_column_id(5)
-    c_up_pri = Gtk.TreeViewColumn(f"Priority {up}", r_center, text=6)
-    c_up_pri.set_sort_column_id(6)
-
-    c_dn_rt = Gtk.TreeViewColumn(f"Rate {dn}", r_right, text=7)
-    c_dn_u = Gtk.TreeViewColumn("", r_left, text=8)
-    c_dn_u.set_fixed_width(40)
-
-    c_up_rt = Gtk.TreeViewColumn(f"Rate {up}", r_right, text=9)
-    c_up_u = Gtk.TreeViewColumn("", r_left, text=10)
-    c_up_u.set_fixed_width(40)
-    tree.append_column(c_name)
-    c_list = [c_dn_max, c_up_max, c_dn_min, c_up_min, c_dn_pri, c_up_pri]
-    for c in c_list:
-        c.set_alignment(0.5)    # set title alignment
-        c.set_expand(True)      # expand when window is wider than necessary
-        tree.append_column(c)
-    tree.append_column(c_dn_rt)
-    tree.append_column(c_dn_u)
-    tree.append_column(c_up_rt)
-    tree.append_column(c_up_u)
-    return tree
-
-
-def update_config_store(store, new_store):
-    # For each row in new_store:
-    for nrow in new_store:
-        # If new_store row is in old store...
-        nscope = nrow[0]
-        match = False
-        for row in store:
-            scope = row[0]
-            if nscope == scope:
-                match = True
-                if nrow[1:7] != row[1:7]:
-                    # ...update old store row with new_store row data.
-                    row[1:7] = nrow[1:7]
-                break
-        # If new_store row is not in old store...
-        if not match:
-            # ...append new_store row to old store.
-            store.append(nrow[:])
-    # For each row in old store:
-    for row in store:
-        # If old store row is not in new_store...
-        scope = row[0]
-        match = False
-        for nrow in new_store:
-            nscope = nrow[0]
-            if scope == nscope:
-                match = True
-        if not match:
-            # ...remove old store row.
-            store.remove(row.iter)
-    return store
+CONFIG_FILE = '/etc/traffic-cop.yaml'
+
+# libyaml's loader is much faster, but it isn't always installed.
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# The config schema is built once. See https://pypi.org/project/schema/
+LIMIT_KEYS = {
+    schema.Optional('download'): str,
+    schema.Optional('upload'): str,
+    schema.Optional('download-minimum'): str,
+    schema.Optional('upload-minimum'): str,
+    schema.Optional('download-priority'): int,
+    schema.Optional('upload-priority'): int,
+}
+MATCH_SCHEMA = [{
+    schema.Optional('cmdline'): str,
+    schema.Optional('exe'): str,
+    schema.Optional('name'): str,
+}]
+PROCESS_NAME = schema.Regex(r'[a-zA-z-]+')
+PROCESS_SCHEMA = schema.Schema({'match': MATCH_SCHEMA, **LIMIT_KEYS})
+CONFIG_SCHEMA = schema.Schema({
+    **LIMIT_KEYS,
+    schema.Optional('processes'): {PROCESS_NAME: PROCESS_SCHEMA},
+})
+# Schemas for one key at a time, used to find where an error is.
+CONFIG_KEYS_SCHEMA = schema.Schema({
+    **LIMIT_KEYS,
+    schema.Optional('processes'): dict,
+})
+PROCESS_KEYS_SCHEMA = schema.Schema({
+    schema.Optional('match'): MATCH_SCHEMA,
+    **LIMIT_KEYS,
+})
 
 
 def convert_dict_to_list(name, v_dict):
@@ -111,26 +64,8 @@ def convert_dict_to_list(name, v_dict):
     up_rate = ' '*4  # '{:.2f}'.format(0)
     up_unit = ' '*4  # 'B/s'
 
-    # The match section can theoretically be any of the attributes that
-    #   psutil.process exposes. This could get really complicated. Just going
-    #   to support 'name', 'exe', and 'cmdline'. Others seem less useful.
-    # List of possible attributes:
-    #   https://psutil.readthedocs.io/en/latest/index.html#psutil.Process.as_dict
     # Get match type and match string.
-    m_str = ''
-    m_type = ''
-    types = [
-        'name',
-        'exe',
-        'cmdline',
-    ]
-    for t in types:
-        match = v_dict.get('match')
-        if match:
-            m_str = match[0].get(t)
-            if m_str:
-                m_type = t
-                break
+    m_type, m_str = matcher.get_match(v_dict)
 
     info_list = [
         name,
@@ -153,54 +88,9 @@ def convert_config_rates_to_human(config):
         128kbit -> ['16', 'KB/s']
         8mbit -> ['1', 'MB/s']
 
-    Handle these pieces with the following cases:
-       number:
-       - [0-9]+ = quantity
-       prefixes:
-       - k|m|g|t = 10^[3|6|9|12]
-       - ki|mi|gi|ti = 2^[10|20|30|40]
-       units:
-       - bit = bits per second
-       - bps = bytes per second
+    Any rate that tc accepts can be given; see the units module.
     '''
-    # re_qty = re.match('^[0-9]+', config)
-    re_full = re.match('(^[0-9]+)([kmgt]?[i]?)([bipst]{3,})$', config)
-    qty = float(re_full.group(1))   # 128, etc.
-    pref_in = re_full.group(2)      # k or ki, etc.
-    unit_in = re_full.group(3)      # bit or bps
-
-    if unit_in == 'bit':
-        # Convert bits to bytes.
-        qty = qty/8
-
-    pref_out = ''
-    if len(pref_in) == 2 and pref_in[1] == 'i':
-        # Take BINARY bytes * 1000/1024 to get SI bytes.
-        qty = qty*1000/1024
-
-    if pref_in == 'k' or pref_in == 'ki':
-        pref_out = 'K'
-    elif pref_in == 'm' or pref_in == 'mi':
-        pref_out = 'M'
-    elif pref_in == 'g' or pref_in == 'gi':
-        pref_out = 'G'
-    elif pref_in == 't' or pref_in == 'ti':
-        pref_out = 'T'
-
-    # Move "down the ladder" if less than 1.
-    if qty < 1 and pref_out:
-        qty = qty*1000
-        if pref_out == 'K':
-            pref_out = ''
-        elif pref_out == 'M':
-            pref_out = 'K'
-        elif pref_out == 'G':
-            pref_out = 'M'
-        elif pref_out == 'T':
-            pref_out = 'G'
-
-    unit_out = pref_out + 'B/s'
-    return ["{:.0f}".format(qty), unit_out]
+    return list(units.format_rate(config))
 
 
 def convert_config_list_units(c_list):
@@ -213,90 +103,167 @@ def convert_config_list_units(c_list):
     for i in range(1, 5):
         if not c_list[i]:
             continue
-        h_list = convert_config_rates_to_human(c_list[i])
+        try:
+            h_list = convert_config_rates_to_human(c_list[i])
+        except ValueError as e:
+            # Show it as written.
+            logging.error(e)
+            continue
         c_list[i] = ' '.join(h_list)
     return c_list
 
 
+class ConfigError(ValueError):
+    '''
+    Invalid config file, with the line and column (from 1) of the problem when
+    they are known.
+    '''
+    def __init__(self, message, f, mark=None, content=None):
+        self.file = f
+        self.line = None
+        self.column = None
+        if mark:
+            self.line = mark.line + 1
+            self.column = mark.column + 1
+        # Whatever could be loaded despite the problem, if anything.
+        self.content = content
+        location = f"{f}:{self.line}:{self.column}" if mark else f"{f}"
+        super().__init__(f"{location}: {message}")
+
+
+def get_item_nodes(node, key):
+    '''
+    Return the (key node, value node) of the given key of a YAML mapping node,
+    or (None, None).
+    '''
+    if isinstance(node, yaml.MappingNode):
+        for k_node, v_node in node.value:
+            if k_node.value == key:
+                return k_node, v_node
+    return None, None
+
+
+def find_error_node(content, root):
+    '''
+    Return the YAML node of the first config key that doesn't fit the schema.
+    '''
+    for key, value in content.items():
+        try:
+            CONFIG_KEYS_SCHEMA.validate({key: value})
+        except schema.SchemaError:
+            return get_item_nodes(root, key)[0]
+    p_root = get_item_nodes(root, 'processes')[1]
+    for name, p in (content.get('processes') or {}).items():
+        try:
+            PROCESS_NAME.validate(name)
+            PROCESS_SCHEMA.validate(p)
+            continue
+        except schema.SchemaError:
+            pass
+        name_node, p_node = get_item_nodes(p_root, name)
+        if isinstance(p, dict):
+            for key, value in p.items():
+                try:
+                    PROCESS_KEYS_SCHEMA.validate({key: value})
+                except schema.SchemaError:
+                    return get_item_nodes(p_node, key)[0]
+        return name_node
+    return root
+
+
+def parse_yaml(f):
+    '''
+    Return the content of a YAML file and its root node, which knows where in
+    the file each part of the content came from. The file is parsed once.
+    '''
+    try:
+        with open(f, 'r') as stream:
+            loader = SafeLoader(stream)
+            try:
+                root = loader.get_single_node()
+                content = None
+                if root is not None:
+                    content = loader.construct_document(root)
+            finally:
+                loader.dispose()
+    except FileNotFoundError:
+        raise ConfigError("File does not exist", f)
+    except OSError as e:
+        raise ConfigError(e.strerror, f)
+    except yaml.MarkedYAMLError as e:
+        raise ConfigError(e.problem, f, e.problem_mark)
+    except yaml.YAMLError as e:
+        raise ConfigError(e, f)
+    return content, root
+
+
+def load_config(f):
+    '''
+    Return the content of the config file, checked against the schema.
+    Raise ConfigError if it isn't valid.
+    '''
+    content, root = parse_yaml(f)
+    if not isinstance(content, dict):
+        mark = root.start_mark if root else None
+        raise ConfigError("No usable config", f, mark, content)
+    try:
+        CONFIG_SCHEMA.validate(content)
+    except schema.SchemaError as e:
+        # The last line names the problem; the node says where it is.
+        message = e.code.splitlines()[-1]
+        node = find_error_node(content, root)
+        mark = node.start_mark if node else None
+        raise ConfigError(message, f, mark, content)
+    return content
+
+
 def validate_yaml(yaml_file):
     """
     Determine if given file exists, has correct syntax, and has correct schema.
     """
-    # Ref:
-    #   https://pypi.org/project/schema/
-    #   https://stackoverflow.com/questions/3262569/validating-a-yaml-document-in-python#22231372
-
-    status = False
-    file_obj = Path(yaml_file)
-    myschema = schema.Schema(
-        {
-            schema.Optional('download'): schema.And(str),
-            schema.Optional('upload'): schema.And(str),
-            schema.Optional('download-minimum'): schema.And(str),
-            schema.Optional('upload-minimum'): schema.And(str),
-            schema.Optional('download-priority'): schema.And(int),
-            schema.Optional('upload-priority'): schema.And(int),
-            schema.Optional('processes'): {
-                schema.Regex(r'[a-zA-z-]+'): {
-                    'match': [{
-                        schema.Optional('cmdline'): schema.And(str),
-                        schema.Optional('exe'): schema.And(str),
-                        schema.Optional('name'): schema.And(str),
-                    }],
-                    schema.Optional('download'): schema.And(str),
-                    schema.Optional('upload'): schema.And(str),
-                    schema.Optional('download-minimum'): schema.And(str),
-                    schema.Optional('upload-minimum'): schema.And(str),
-                    schema.Optional('download-priority'): schema.And(int),
-                    schema.Optional('upload-priority'): schema.And(int),
-                },
-            },
-        }
-    )
-    if file_obj.is_file():
-        # Test if YAML syntax is correct.
-        with open(yaml_file, 'r') as f:
-            try:
-                data = yaml.safe_load(f)
-                # Test if YAML matches schema.
-                try:
-                    myschema.validate(data)
-                    status = True
-                except schema.SchemaError as e:
-                    logging.error(e)
-            except yaml.YAMLError as e:
-                logging.error(e)
-    else:
-        logging.error(f"File does not exist: {file_obj}")
-
-    return status
+    try:
+        load_config(yaml_file)
+    except ConfigError as e:
+        logging.error(e)
+        return False
+    return True
 
 
-def convert_yaml_to_store(f, test=False):
+def read_config_dict(f, test=False):
+    '''
+    Return the validated config file as {scope: config}, with entries for the
+    Global and unknown TCP/UDP scopes, or '' if it has no usable config.
+    '''
     logging.info(f"Reading config from {f}")
 
-    # Validate YAML file.
-    if not validate_yaml(f):
+    try:
+        content = load_config(f)
+    except ConfigError as e:
+        logging.error(e)
         logging.error(f"Invalid config file: {f}")
         # Use default config file.
         logging.error("Resetting to default config.")
+        content = e.content
         if not test:
             p = subprocess.run(['pkexec', '/usr/bin/traffic-cop', '--reset'])
+            # Read the default config that replaced it.
+            try:
+                content = parse_yaml(f)[0]
+            except ConfigError as e:
+                logging.error(e)
+                return ''
 
-    # Get dict from yaml file.
-    with open(f, 'r') as stream:
-        try:
-            content = yaml.safe_load(stream)
-        except Exception as e:
-            # Not likely to happen?
-            logging.error(e)
-            return ''
-
-    if not content:
+    if not content or not isinstance(content, dict):
         # Yaml file has no viable content.
         logging.warning(f"\"{f}\" has no usable config.")
         return ''
+    return convert_content_to_dict(content)
+
 
+def convert_content_to_dict(content):
+    '''
+    Return the loaded config file content as {scope: config}.
+    '''
     # Move global config keys into their own dict under a 'Global' key.
     config_dict = {}
     g_name = 'Global'
@@ -333,22 +300,17 @@ def convert_yaml_to_store(f, test=False):
         'match-str': 'unknown',
     }
     # Add entries for Process config keys.
-    for p_name, p in content['processes'].items():
+    for p_name, p in (content.get('processes') or {}).items():
         config_dict[p_name] = p
 
-    # Convert dict to a list store.
-    store = convert_dict_to_store(config_dict)
-    return store
-
-
-def convert_dict_to_store(data_dict):
-    store = Gtk.ListStore(
-        str, str, str, str, str, int,
-        int, str, str, str, str, str, str,
-    )
-    for k, v in data_dict.items():
-        lst = convert_dict_to_list(k, v)
-        logging.debug(f"New ListStore line: {lst}")
-        lst = convert_config_list_units(lst)  # in-place updating of list items
-        store.append(lst)
-    return store
+    return config_dict
+
+
+def load_matcher(f):
+    '''
+    Return a ScopeMatcher for the config file, without validating it.
+    '''
+    content = parse_yaml(f)[0]
+    if not isinstance(content, dict):
+        raise ValueError(f"\"{f}\" has no usable config.")
+    return matcher.ScopeMatcher(matcher.get_rules(content))
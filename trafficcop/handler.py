@@ -3,7 +3,6 @@
 import logging
 import psutil
 import subprocess
-from pathlib import Path
 
 from . import utils
 
@@ -62,31 +61,26 @@ class Handler():
         # NOTE: Button later renamed to "Edit..."
         cmd = ["/usr/bin/gnome-text-editor", "admin:///etc/traffic-cop.yaml"]
         subprocess.Popen(cmd)
-        # Set apply button to "sensitive".
-        self.app.button_apply.set_sensitive(True)
+        # The config file is watched; saving it updates the window.
 
     def on_button_apply_clicked(self, button):
         # Check service status and update widgets.
         if self.app.active_state == 'active':
-            # Restart the service to apply updated configuration.
-            self.app.restart_service()
+            # Apply the updated configuration to the running service.
+            self.app.apply_config()
         else:
             self.app.treeview_config = self.app.update_treeview_config()
         # Disable the button again.
         button.set_sensitive(False)
 
     def on_button_reset_clicked(self, button):
-        current = Path("/etc/traffic-cop.yaml")
-        default = self.app.default_config
-
         # Get user confirmation before resetting configuration.
         approved = self.app.get_user_confirmation()
         if not approved:
             return
 
         # First check if current config matches default config.
-        diff = utils.check_diff(current, default)
-        if diff == 0:
+        if self.app.is_default_config:
             # Already using the default config.
             logging.debug("Using default config.")
             return
@@ -0,0 +1,168 @@
+""" Fixed-size history of the byte totals of each scope. """
+
+import bisect
+import math
+
+from array import array
+from typing import NamedTuple
+
+# Default length of the history, in seconds.
+HISTORY_SECONDS = 600
+# Time constant, in seconds, of the smoothed (EWMA) rates.
+EWMA_TAU = 5.0
+# Smoothed rates below this many B/s are shown as 0.
+MIN_RATE = 0.5
+
+
+class Stats(NamedTuple):
+    ewma_dn: float
+    ewma_up: float
+    avg_dn: float
+    avg_up: float
+    peak_dn: float
+    peak_up: float
+
+
+class ScopeHistory():
+    '''
+    Ring buffer of timestamped byte totals of one scope, with the rate over
+    the interval ending at each sample, and EWMA-smoothed rates that are
+    updated with each new sample. Its memory use is fixed by its size.
+    '''
+    __slots__ = [
+        'times', 'totals_dn', 'totals_up', 'rates_dn', 'rates_up',
+        'index', 'count', 'ewma_dn', 'ewma_up', 'version',
+    ]
+
+    def __init__(self, size):
+        zeros = [0.0] * size
+        self.times = array('d', zeros)
+        self.totals_dn = array('d', zeros)
+        self.totals_up = array('d', zeros)
+        self.rates_dn = array('d', zeros)
+        self.rates_up = array('d', zeros)
+        # Position of the next sample.
+        self.index = 0
+        self.count = 0
+        self.ewma_dn = 0.0
+        self.ewma_up = 0.0
+        # Incremented with each new sample.
+        self.version = 0
+
+    def add(self, t, bytes_dn, bytes_up, tau=EWMA_TAU):
+        '''
+        Add a sample. Return False if it isn't newer than the last one.
+        '''
+        size = len(self.times)
+        rate_dn = 0.0
+        rate_up = 0.0
+        if self.count:
+            last = (self.index - 1) % size
+            elapsed = t - self.times[last]
+            if elapsed <= 0:
+                return False
+            # Totals that went down have been reset; count that as no traffic.
+            rate_dn = max(bytes_dn - self.totals_dn[last], 0) / elapsed
+            rate_up = max(bytes_up - self.totals_up[last], 0) / elapsed
+            # Weight the new rate by how long it was measured over.
+            alpha = 1 - math.exp(-elapsed / tau)
+            self.ewma_dn += alpha * (rate_dn - self.ewma_dn)
+            self.ewma_up += alpha * (rate_up - self.ewma_up)
+
+        i = self.index
+        self.times[i] = t
+        self.totals_dn[i] = bytes_dn
+        self.totals_up[i] = bytes_up
+        self.rates_dn[i] = rate_dn
+        self.rates_up[i] = rate_up
+        self.index = (i + 1) % size
+        self.count = min(self.count + 1, size)
+        self.version += 1
+        return True
+
+    def ordered(self, values):
+        '''
+        Return the samples in values from oldest to newest.
+        '''
+        if self.count < len(values):
+            return values[:self.count]
+        return values[self.index:] + values[:self.index]
+
+    def smoothed(self):
+        '''
+        Return the smoothed [rate_dn, rate_up].
+        '''
+        return [
+            self.ewma_dn if self.ewma_dn >= MIN_RATE else 0.0,
+            self.ewma_up if self.ewma_up >= MIN_RATE else 0.0,
+        ]
+
+    def stats(self, window=None):
+        '''
+        Return Stats over the last window seconds, or over the whole history.
+        '''
+        times = self.ordered(self.times)
+        if not times:
+            return Stats(0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        start = 0
+        if window:
+            start = bisect.bisect_left(times, times[-1] - window)
+        elapsed = times[-1] - times[start]
+        averages = []
+        peaks = []
+        for totals, rates in [
+            (self.totals_dn, self.rates_dn),
+            (self.totals_up, self.rates_up),
+        ]:
+            totals = self.ordered(totals)
+            avg = 0.0
+            if elapsed > 0:
+                avg = max(totals[-1] - totals[start], 0) / elapsed
+            averages.append(avg)
+            # The rate of the first sample is from before the window.
+            peaks.append(max(self.ordered(rates)[start + 1:], default=0.0))
+        return Stats(*self.smoothed(), *averages, *peaks)
+
+
+class RateHistory():
+    '''
+    The ScopeHistory of every scope, all of the same size.
+    '''
+    def __init__(self, seconds=HISTORY_SECONDS, interval=1.0, tau=EWMA_TAU):
+        self.size = max(int(seconds / interval), 2)
+        self.tau = tau
+        self.scopes = {}
+
+    def add_samples(self, scopes):
+        '''
+        Add the 'now' sample of each scope in the scopes dict.
+        '''
+        for scope, data in scopes.items():
+            now = data.get('now')
+            if not now or None in now.values():
+                continue
+            history = self.scopes.get(scope)
+            if not history:
+                history = ScopeHistory(self.size)
+                self.scopes[scope] = history
+            history.add(
+                now['time'],
+                now['bytes_dn'],
+                now['bytes_up'],
+                self.tau,
+            )
+
+    def get_rates(self, scope):
+        '''
+        Return the smoothed [rate_dn, rate_up] of the scope, or None.
+        '''
+        history = self.scopes.get(scope)
+        if not history or history.count < 2:
+            return None
+        return history.smoothed()
+
+    def stats(self, window=None):
+        '''
+        Return {scope: Stats} over the last window seconds for all scopes.
+        '''
+        return {s: h.stats(window) for s, h in self.scopes.items()}
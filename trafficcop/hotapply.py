@@ -0,0 +1,277 @@
+""" Applying config changes to the running TrafficToll without a restart. """
+# TrafficToll (tt) sets up its tc classes once, at start. The limits and
+# priorities of scopes it already shapes can be changed in place with
+# "tc class change", which keeps shaping all traffic. Anything else (added or
+# removed scopes, other match rules, Global limits, or a class that can't be
+# told apart from the others) still needs tt to be restarted.
+
+import argparse
+import logging
+import os
+import re
+import shutil
+import subprocess
+
+from pathlib import Path
+from typing import NamedTuple
+
+from . import config
+from . import model
+from . import units
+from . import utils
+
+# Copy of the config that tt was started with or last hot-applied; written by
+# tt-wrapper.
+APPLIED_FILE = Path('/run/traffic-cop/applied.yaml')
+# Exit status of --hot-apply when the service has to be restarted instead.
+NEEDS_RESTART = 2
+# tc shows rates rounded, so they match the config within this fraction.
+RATE_TOLERANCE = 0.01
+
+CLASS_RE = re.compile(
+    r'class htb (?P<classid>\S+) (?:root|parent (?P<parent>\S+))'
+    r'(?: leaf \S+)?(?: prio (?P<prio>\d+))?.*?'
+    r' rate (?P<rate>\S+) ceil (?P<ceil>\S+)'
+)
+REDIRECT_RE = re.compile(r'redirect dev (\S+)')
+
+
+class NeedsRestart(Exception):
+    '''
+    The config change can't be applied to the running tt.
+    '''
+
+
+class TcClass(NamedTuple):
+    '''
+    HTB class as shown by "tc class show", with rates in B/s.
+    '''
+    device: str
+    classid: str
+    parent: str
+    prio: int
+    rate: int
+    ceil: int
+
+
+class Limits(NamedTuple):
+    '''
+    A scope's configured limits in one direction, in B/s, or None if unset.
+    '''
+    ceil: int
+    rate: int
+    prio: int
+
+
+def parse_classes(text, device):
+    '''
+    Return the TcClasses in "tc class show dev <device>" output.
+    '''
+    classes = []
+    for line in text.splitlines():
+        m = CLASS_RE.match(line.strip())
+        if not m:
+            continue
+        classid = m.group('classid')
+        # The root class's parent is the qdisc itself.
+        parent = m.group('parent') or f"{classid.split(':')[0]}:"
+        prio = m.group('prio')
+        classes.append(
+            TcClass(
+                device,
+                classid,
+                parent,
+                int(prio) if prio is not None else None,
+                units.parse_rate(m.group('rate')),
+                units.parse_rate(m.group('ceil')),
+            )
+        )
+    return classes
+
+
+def run_tc(args):
+    p = subprocess.run(
+        ['tc', *args],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if p.returncode != 0:
+        raise NeedsRestart(f"tc {' '.join(args)}: {p.stderr.strip()}")
+    return p.stdout
+
+
+def get_classes(device):
+    return parse_classes(run_tc(['class', 'show', 'dev', device]), device)
+
+
+def get_ifb_device(device):
+    '''
+    Return the device that the ingress traffic of the device is redirected to
+    for shaping downloads.
+    '''
+    text = run_tc(['filter', 'show', 'dev', device, 'parent', 'ffff:'])
+    m = REDIRECT_RE.search(text)
+    if not m:
+        raise NeedsRestart(f"No ingress redirect found for {device}")
+    return m.group(1)
+
+
+def get_limits(scope):
+    '''
+    Return the (download, upload) Limits of a ScopeConfig.
+    '''
+    def to_bytes(rate):
+        if not rate:
+            return None
+        if units.is_percent(rate):
+            raise NeedsRestart(f"{scope.name}: {rate} depends on the device")
+        return units.parse_rate(rate)
+
+    download = Limits(
+        to_bytes(scope.download),
+        to_bytes(scope.download_minimum),
+        scope.download_priority,
+    )
+    upload = Limits(
+        to_bytes(scope.upload),
+        to_bytes(scope.upload_minimum),
+        scope.upload_priority,
+    )
+    return download, upload
+
+
+def is_close(shown, configured):
+    return abs(shown - configured) <= configured * RATE_TOLERANCE
+
+
+def find_class(classes, limits):
+    '''
+    Return the only class that has the given limits, or None.
+    '''
+    if limits.ceil is None and limits.rate is None:
+        return None
+    found = [
+        c for c in classes
+        if (limits.ceil is None or is_close(c.ceil, limits.ceil)) and
+        (limits.rate is None or is_close(c.rate, limits.rate)) and
+        c.prio in [None, limits.prio]
+    ]
+    return found[0] if len(found) == 1 else None
+
+
+def plan_changes(old_model, new_model, dn_classes, up_classes):
+    '''
+    Return the "tc class change" arguments that take tt from the old config
+    to the new one. Raise NeedsRestart if that isn't possible.
+    '''
+    old_rules = [s.rule for s in old_model.scopes]
+    new_rules = [s.rule for s in new_model.scopes]
+    if old_rules != new_rules:
+        raise NeedsRestart("Scopes or match rules changed")
+
+    changes = []
+    for old, new in zip(old_model.scopes, new_model.scopes):
+        if old == new:
+            continue
+        if old.name == 'Global':
+            raise NeedsRestart("Global limits changed")
+        directions = zip(
+            ['download', 'upload'],
+            get_limits(old),
+            get_limits(new),
+            [dn_classes, up_classes],
+        )
+        for direction, old_limits, new_limits, classes in directions:
+            if old_limits == new_limits:
+                continue
+            removed = [
+                old_value is not None and new_value is None
+                for old_value, new_value in zip(old_limits, new_limits)
+            ]
+            if any(removed):
+                # tt's default for an unset limit isn't known here.
+                raise NeedsRestart(f"{new.name}: {direction} limit removed")
+            c = find_class(classes, old_limits)
+            if not c:
+                msg = f"{new.name}: no single tc class for {direction}"
+                raise NeedsRestart(msg)
+            ceil = new_limits.ceil or c.ceil
+            rate = new_limits.rate or c.rate
+            if rate > ceil:
+                raise NeedsRestart(f"{new.name}: {direction} minimum > limit")
+            args = [
+                'class', 'change', 'dev', c.device,
+                'parent', c.parent, 'classid', c.classid,
+                'htb', 'rate', f"{rate}bps", 'ceil', f"{ceil}bps",
+            ]
+            if c.prio is not None:
+                args.extend(['prio', str(new_limits.prio)])
+            changes.append(args)
+    return changes
+
+
+def load_model(f):
+    return model.ConfigModel.from_content(config.load_config(f))
+
+
+def hot_apply(config_file=config.CONFIG_FILE, applied_file=APPLIED_FILE):
+    '''
+    Change the running tt's classes to match the config file, then record it
+    as applied. Raise NeedsRestart if the service has to be restarted instead,
+    or ConfigError if the config file isn't valid.
+    '''
+    new_model = load_model(config_file)
+    try:
+        old_model = load_model(applied_file)
+    except config.ConfigError as e:
+        raise NeedsRestart(f"No applied config: {e}")
+    tt_pid, tt_start, device = utils.get_tt_info()
+    if tt_pid < 0:
+        raise NeedsRestart("tt is not running")
+
+    changes = plan_changes(
+        old_model,
+        new_model,
+        get_classes(get_ifb_device(device)),
+        get_classes(device),
+    )
+    for args in changes:
+        logging.info(f"Running: tc {' '.join(args)}")
+        run_tc(args)
+    shutil.copyfile(config_file, applied_file)
+    logging.info(f"Hot-applied {len(changes)} tc class changes.")
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='traffic-cop --hot-apply',
+        description="Apply config changes to the running TrafficToll without"
+        " restarting it. Exits with 2 if the service has to be restarted"
+        " instead.",
+    )
+    parser.add_argument(
+        '--hot-apply', action='store_true',
+        help=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        '-d', '--debug', action='store_true',
+        help="Print DEBUG info to stdout.",
+    )
+    args = parser.parse_args(argv)
+
+    log_level = logging.DEBUG if args.debug else logging.INFO
+    utils.set_up_logging(log_level)
+    if os.geteuid() != 0:
+        logging.critical("Please rerun the command with pkexec or sudo.")
+        return 1
+    try:
+        hot_apply()
+    except NeedsRestart as e:
+        logging.warning(f"Service restart needed: {e}")
+        return NEEDS_RESTART
+    except (config.ConfigError, OSError) as e:
+        logging.error(e)
+        return 1
+    return 0
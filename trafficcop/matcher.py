@@ -0,0 +1,151 @@
+""" Matching of processes to configured scopes. """
+
+import logging
+import re
+
+from collections import OrderedDict
+
+# Scopes that are shown in the window but never matched to a process.
+BUILTIN_SCOPES = ['Global', 'unknown TCP', 'unknown UDP']
+
+# Characters that make a pattern more than a literal string.
+REGEX_CHARS = set('.^$*+?{}[]\\|()')
+
+# Process attributes that scopes can be matched by, by priority.
+MATCH_TYPES = ['name', 'exe', 'cmdline']
+
+
+def get_match(v_dict):
+    '''
+    Return the (match-type, match-str) of a scope's config dict.
+    '''
+    # The match section can theoretically be any of the attributes that
+    #   psutil.process exposes. This could get really complicated. Just going
+    #   to support 'name', 'exe', and 'cmdline'. Others seem less useful.
+    # List of possible attributes:
+    #   https://psutil.readthedocs.io/en/latest/#psutil.Process.as_dict
+    m_str = ''
+    m_type = ''
+    for t in MATCH_TYPES:
+        match = v_dict.get('match')
+        if match:
+            m_str = match[0].get(t)
+            if m_str:
+                m_type = t
+                break
+    return m_type, m_str
+
+
+def get_rules(content):
+    '''
+    Return the (scope, match-type, match-str) rules of a loaded config file, in
+    config order.
+    '''
+    rules = [(scope, '', '') for scope in BUILTIN_SCOPES]
+    processes = content.get('processes') or {}
+    for scope, v_dict in processes.items():
+        if not type(v_dict) is dict:
+            v_dict = {}
+        rules.append((scope, *get_match(v_dict)))
+    return rules
+
+
+class ScopeMatcher():
+    '''
+    Match process info to a configured scope.
+    This is built once per config load from (scope, match-type, match-str)
+    rules. As when walking the config from top to bottom, the first matching
+    rule wins:
+      - exe: exact string equality, looked up in a dict.
+      - name: literal patterns are looked up in a dict by each prefix of the
+        process name, since re.match() only anchors at the start; other
+        patterns are precompiled.
+      - cmdline: patterns are precompiled.
+    '''
+    def __init__(self, rules):
+        self.exes = {}
+        self.names = {}
+        self.name_res = []
+        self.cmdline_res = []
+        for i, (scope, m_type, m_str) in enumerate(rules):
+            if scope in BUILTIN_SCOPES:
+                continue
+            if m_type == 'exe':
+                self.exes.setdefault(m_str, (i, scope))
+            elif m_type == 'name' and REGEX_CHARS.isdisjoint(m_str):
+                self.names.setdefault(m_str, (i, scope))
+            elif m_type == 'name' or m_type == 'cmdline':
+                try:
+                    regex = re.compile(m_str)
+                except re.error as e:
+                    logging.error(
+                        f"Invalid {m_type} pattern for '{scope}': {e}"
+                    )
+                    continue
+                if m_type == 'name':
+                    self.name_res.append((i, scope, regex))
+                else:
+                    self.cmdline_res.append((i, scope, regex))
+            else:
+                # Unhandled match-type.
+                msg = f"Unhandled match-type for scope: '{scope}: {m_type}'"
+                logging.warning(msg)
+
+    def match(self, proc):
+        '''
+        Return the scope that matches the given process info, or None.
+        '''
+        # Each hit is an (index, scope) tuple; the lowest index wins.
+        best = self.exes.get(proc.exe)
+        name = proc.name or ''
+        for i in range(len(name) + 1):
+            hit = self.names.get(name[:i])
+            if hit and (not best or hit < best):
+                best = hit
+        cmdline = ' '.join(proc.cmdline or [])
+        for rules, target in [
+            (self.name_res, name),
+            (self.cmdline_res, cmdline),
+        ]:
+            for i, scope, regex in rules:
+                if best and i > best[0]:
+                    break
+                if regex.match(target):
+                    best = (i, scope)
+                    break
+        scope = best[1] if best else None
+        logging.debug(f"Process \"{proc}\" matched to scope \"{scope}\"")
+        return scope
+
+
+class ScopeCache():
+    '''
+    Bounded LRU memo of process key (pid, create_time) -> scope. Processes that
+    match no scope are remembered too, as None. Entries are discarded when
+    their process exits, and the whole memo is cleared when it is used with a
+    different matcher, i.e. after the config is reloaded.
+    '''
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.matcher = None
+
+    def lookup(self, proc, matcher):
+        if matcher is not self.matcher:
+            self.entries.clear()
+            self.matcher = matcher
+        key = proc.key
+        try:
+            scope = self.entries[key]
+        except KeyError:
+            scope = matcher.match(proc)
+            self.entries[key] = scope
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return scope
+
+    def discard(self, keys):
+        for key in keys:
+            self.entries.pop(key, None)
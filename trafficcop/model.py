@@ -0,0 +1,235 @@
+""" Scope config and stats, independent of GTK. """
+# The config store and the other views are built from these immutable
+# snapshots, so that matching and rates never need GObject or a display.
+
+import hashlib
+import logging
+import os
+import pickle
+
+from pathlib import Path
+from typing import NamedTuple
+
+from . import config
+from . import matcher
+from . import rates
+from . import utils
+
+# Matcher of a config without process scopes.
+NO_RULES = matcher.ScopeMatcher([])
+
+# Compiled config kept in the state dir; bump the format if the pickled
+# classes or the rates shown in the rows change.
+CACHE_NAME = 'config.cache'
+CACHE_FORMAT = 2
+
+
+class ScopeConfig(NamedTuple):
+    '''
+    Limits, priorities and match rule of one configured scope, with the limits
+    as written in the config file (e.g. '3mbps').
+    '''
+    name: str
+    download: str = ''
+    upload: str = ''
+    download_minimum: str = ''
+    upload_minimum: str = ''
+    download_priority: int = 9
+    upload_priority: int = 9
+    match_type: str = ''
+    match_str: str = ''
+
+    @classmethod
+    def from_dict(cls, name, v_dict):
+        row = config.convert_dict_to_list(name, v_dict)
+        return cls(*row[:7], *row[11:])
+
+    @property
+    def rule(self):
+        return (self.name, self.match_type, self.match_str)
+
+    def to_row(self):
+        '''
+        Return the config store row, with human-readable limits and blank rate
+        cells.
+        '''
+        blank = ' '*4
+        row = [*self[:7], blank, blank, blank, blank, *self[7:]]
+        return config.convert_config_list_units(row)
+
+
+class ConfigModel(NamedTuple):
+    '''
+    All configured scopes in config order, with their config store rows and
+    the matcher built from them. A new model is made for each config load
+    rather than changing this one.
+    '''
+    scopes: tuple = ()
+    matcher: 'matcher.ScopeMatcher' = NO_RULES
+    rows: tuple = ()
+
+    @classmethod
+    def from_dict(cls, config_dict):
+        scopes = tuple(
+            ScopeConfig.from_dict(k, v) for k, v in config_dict.items()
+        )
+        return cls(
+            scopes,
+            matcher.ScopeMatcher([s.rule for s in scopes]),
+            tuple(s.to_row() for s in scopes),
+        )
+
+    @classmethod
+    def from_content(cls, content):
+        return cls.from_dict(config.convert_content_to_dict(content))
+
+    def names(self):
+        return [s.name for s in self.scopes]
+
+    def get(self, name):
+        for s in self.scopes:
+            if s.name == name:
+                return s
+        return None
+
+
+class ConfigChanges(NamedTuple):
+    '''
+    What changes a config store from one ConfigModel to another: the names of
+    removed scopes, (name, store columns 1-6) of changed scopes, and (name
+    of the scope to insert after or None, row) of added scopes.
+    '''
+    removed: list
+    updated: list
+    added: list
+
+
+class ScopeStats(NamedTuple):
+    '''
+    Running byte totals and current rates (B/s) of one scope.
+    '''
+    name: str
+    bytes_dn: int
+    bytes_up: int
+    rate_dn: float
+    rate_up: float
+
+
+def get_cache_key(f):
+    '''
+    Return what identifies the current content of the file, or None if it
+    can't be read.
+    '''
+    path = Path(f)
+    try:
+        stat = path.stat()
+        data = path.read_bytes()
+    except OSError:
+        return None
+    return (
+        CACHE_FORMAT,
+        config.VERSION,
+        str(path.resolve()),
+        stat.st_size,
+        stat.st_mtime_ns,
+        hashlib.sha256(data).hexdigest(),
+    )
+
+
+def read_cache(cache_file, key):
+    '''
+    Return the cached ConfigModel for the key, or None.
+    '''
+    try:
+        with open(cache_file, 'rb') as f:
+            cached_key, config_model = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+            ImportError, TypeError, ValueError) as e:
+        logging.debug(f"No usable config cache: {e}")
+        return None
+    if cached_key != key:
+        return None
+    return config_model
+
+
+def write_cache(cache_file, key, config_model):
+    tmp_file = cache_file.with_suffix('.tmp')
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_file, 'wb') as f:
+            pickle.dump((key, config_model), f)
+        # Readers never see a partly written cache.
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logging.warning(f"Config cache not saved: {e}")
+
+
+def load_config(f, test=False, cache_dir=None):
+    '''
+    Return the ConfigModel of the config file, or None if it has no usable
+    config. A valid config is cached, so that it isn't parsed again until the
+    file changes.
+    '''
+    cache_file = Path(cache_dir or utils.get_state_dir()) / CACHE_NAME
+    key = get_cache_key(f)
+    if key:
+        config_model = read_cache(cache_file, key)
+        if config_model:
+            logging.info(f"Using cached config for {f}")
+            return config_model
+
+    logging.info(f"Reading config from {f}")
+    try:
+        content = config.load_config(f)
+    except config.ConfigError:
+        # Let the usual path report the problem and reset the config.
+        config_dict = config.read_config_dict(f, test)
+        if not config_dict:
+            return None
+        return ConfigModel.from_dict(config_dict)
+    config_model = ConfigModel.from_content(content)
+    # Only cache the model if the file didn't change while being read.
+    if key and get_cache_key(f) == key:
+        write_cache(cache_file, key, config_model)
+    return config_model
+
+
+def diff_models(old, new):
+    '''
+    Return the ConfigChanges from the old model to the new one, by scope
+    name. Kept scopes stay where they are; added ones follow the scope before
+    them in the new config.
+    '''
+    old_rows = {row[0]: row for row in old.rows}
+    new_names = {row[0] for row in new.rows}
+    removed = [name for name in old_rows if name not in new_names]
+    updated = []
+    added = []
+    previous = None
+    for row in new.rows:
+        name = row[0]
+        old_row = old_rows.get(name)
+        if old_row is None:
+            added.append((previous, row))
+        elif old_row[1:7] != row[1:7]:
+            updated.append((name, row[1:7]))
+        previous = name
+    return ConfigChanges(removed, updated, added)
+
+
+def get_scope_stats(scopes, rate_history=None):
+    '''
+    Return {scope: ScopeStats} for each scope with a rate.
+    '''
+    stats = {}
+    scope_rates = rates.get_scope_rates(scopes, rate_history)
+    for scope, (rate_dn, rate_up) in scope_rates.items():
+        now = scopes[scope]['now']
+        stats[scope] = ScopeStats(
+            scope,
+            now['bytes_dn'],
+            now['bytes_up'],
+            rate_dn,
+            rate_up,
+        )
+    return stats
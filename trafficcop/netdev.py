@@ -0,0 +1,257 @@
+""" Tracking of the gateway network device and its byte counters. """
+
+import logging
+import os
+
+from . import utils
+
+# Kernel routing tables, with the indexes of their usage-counter columns, which
+# change without the routes themselves changing.
+ROUTE_FILES = {
+    '/proc/net/route': (4, 5),
+    '/proc/net/ipv6_route': (6, 7),
+}
+
+# Counters read from /proc/net/dev can be 32-bit on older drivers.
+COUNTER_32_MAX = 2**32
+
+# Device types (/sys/class/net/<dev>/type) whose traffic is carried over
+# another, underlay device.
+TUNNEL_TYPES = [
+    512,    # ARPHRD_PPP
+    768,    # ARPHRD_TUNNEL
+    769,    # ARPHRD_TUNNEL6
+    776,    # ARPHRD_SIT
+    778,    # ARPHRD_IPGRE
+    65534,  # ARPHRD_NONE: wireguard, tun
+]
+
+
+def read_routes(route_files=ROUTE_FILES):
+    routes = []
+    for path, counters in route_files.items():
+        try:
+            with open(path) as f:
+                lines = f.readlines()
+        except OSError:
+            lines = []
+        for line in lines:
+            fields = line.split()
+            routes.append(
+                tuple(v for i, v in enumerate(fields) if i not in counters)
+            )
+    return routes
+
+
+def is_tunnel(device, sys_dir='/sys/class/net'):
+    dev_dir = os.path.join(sys_dir, device)
+    if os.path.exists(os.path.join(dev_dir, 'tun_flags')):
+        # tun or tap device.
+        return True
+    try:
+        with open(os.path.join(dev_dir, 'type')) as f:
+            return int(f.read()) in TUNNEL_TYPES
+    except (OSError, ValueError):
+        return False
+
+
+class DeviceTracker():
+    '''
+    Cache of the current gateway device, and of the devices whose traffic
+    counts toward the Global scope: the configured interfaces, or else all
+    gateway devices.
+    poll() is cheap enough to call on every rates update: it only asks
+    netifaces for the gateways again when the kernel routing tables have
+    changed. When the gateway device changes, each connected callback is
+    called with the old and new device names.
+    '''
+    def __init__(self, route_files=ROUTE_FILES, interfaces=None):
+        self.route_files = route_files
+        self.interfaces = interfaces
+        self.routes = read_routes(self.route_files)
+        self.device = utils.get_net_device()
+        self.devices = self.get_devices()
+        self.callbacks = []
+        logging.info(f"Gateway device: {self.device}")
+        logging.info(f"Global devices: {self.devices}")
+
+    def get_devices(self):
+        if self.interfaces:
+            return list(self.interfaces)
+        return utils.get_net_devices()
+
+    def connect(self, callback):
+        self.callbacks.append(callback)
+
+    def poll(self):
+        routes = read_routes(self.route_files)
+        if routes == self.routes:
+            return self.device
+        self.routes = routes
+        devices = self.get_devices()
+        if devices != self.devices:
+            logging.info(f"Global devices changed to {devices}")
+            self.devices = devices
+        device = utils.get_net_device()
+        if device != self.device:
+            old = self.device
+            self.device = device
+            logging.info(f"Gateway device changed from {old} to {device}")
+            for callback in self.callbacks:
+                callback(old, device)
+        return self.device
+
+
+def counter_delta(old, new, wrap32=False):
+    '''
+    Return the increase of a byte counter from old to new. A 32-bit counter
+    (wrap32) that went down from its upper half wrapped around; any other
+    counter that went down was reset (e.g. the device was re-created), in
+    which case it counted up from 0.
+    '''
+    if new >= old:
+        return new - old
+    if wrap32 and COUNTER_32_MAX // 2 <= old < COUNTER_32_MAX:
+        return new + COUNTER_32_MAX - old
+    return new
+
+
+class CounterReader():
+    '''
+    Running [bytes_up, bytes_dn] totals of one device.
+    The device's sysfs statistics files are kept open and re-read with pread;
+    if they can't be opened, /proc/net/dev is parsed instead. The totals keep
+    counting up across counter wraparound, counter resets and device changes,
+    so they never go backwards.
+    '''
+    def __init__(
+        self,
+        device=None,
+        sys_dir='/sys/class/net',
+        proc_file='/proc/net/dev'
+    ):
+        self.sys_dir = sys_dir
+        self.proc_file = proc_file
+        self.device = None
+        self.fds = []
+        self.last = None
+        self.totals = [0, 0]
+        self.set_device(device)
+
+    def set_device(self, device):
+        self.close()
+        self.device = device
+        # The first reading of the new device is the new baseline.
+        self.last = None
+        if not device:
+            return
+        stats_dir = os.path.join(self.sys_dir, device, 'statistics')
+        try:
+            for name in ['tx_bytes', 'rx_bytes']:
+                path = os.path.join(stats_dir, name)
+                self.fds.append(os.open(path, os.O_RDONLY))
+        except OSError as e:
+            logging.debug(f"Falling back to {self.proc_file}: {e}")
+            self.close()
+
+    def close(self):
+        for fd in self.fds:
+            os.close(fd)
+        self.fds = []
+
+    def read_raw(self):
+        '''
+        Return the device's current (tx_bytes, rx_bytes), or None.
+        '''
+        try:
+            if self.fds:
+                return tuple(int(os.pread(fd, 32, 0)) for fd in self.fds)
+            with open(self.proc_file) as f:
+                for line in f:
+                    name, sep, data = line.partition(':')
+                    if sep and name.strip() == self.device:
+                        fields = data.split()
+                        return (int(fields[8]), int(fields[0]))
+        except (OSError, ValueError, IndexError) as e:
+            logging.debug(f"Failed to read counters of {self.device}: {e}")
+        return None
+
+    def read(self):
+        if self.device:
+            raw = self.read_raw()
+            if raw is not None and self.last is not None:
+                # sysfs counters are 64-bit; /proc/net/dev can show 32-bit
+                # ones.
+                wrap32 = not self.fds
+                for i in range(2):
+                    self.totals[i] += counter_delta(
+                        self.last[i],
+                        raw[i],
+                        wrap32,
+                    )
+            if raw is not None:
+                self.last = raw
+        return list(self.totals)
+
+
+class GlobalCounters():
+    '''
+    Running [bytes_up, bytes_dn] totals of the Global scope over a set of
+    devices, with a CounterReader for each device.
+    Traffic through a tunnel (e.g. a VPN) also passes over its underlay
+    device, so tunnel devices are only counted if no underlay device is in
+    the set. The totals of every device are still kept for a per-device
+    breakdown.
+    '''
+    def __init__(
+        self,
+        devices=[],
+        sys_dir='/sys/class/net',
+        proc_file='/proc/net/dev'
+    ):
+        self.sys_dir = sys_dir
+        self.proc_file = proc_file
+        self.readers = {}
+        self.tunnels = {}
+        self.last = {}
+        self.totals = [0, 0]
+        self.set_devices(devices)
+
+    def set_devices(self, devices):
+        for dev in list(self.readers):
+            if dev not in devices:
+                self.readers.pop(dev).close()
+                self.tunnels.pop(dev)
+                self.last.pop(dev, None)
+        for dev in devices:
+            if dev not in self.readers:
+                self.readers[dev] = CounterReader(
+                    dev,
+                    self.sys_dir,
+                    self.proc_file,
+                )
+                self.tunnels[dev] = is_tunnel(dev, self.sys_dir)
+
+    def counted(self):
+        '''
+        Return the devices whose traffic counts toward the Global totals.
+        '''
+        underlay = [d for d in self.readers if not self.tunnels[d]]
+        return underlay or list(self.readers)
+
+    def read(self):
+        counted = self.counted()
+        for dev, reader in self.readers.items():
+            totals = reader.read()
+            last = self.last.get(dev, totals)
+            if dev in counted:
+                for i in range(2):
+                    self.totals[i] += totals[i] - last[i]
+            self.last[dev] = totals
+        return list(self.totals)
+
+    def breakdown(self):
+        '''
+        Return the latest {device: [bytes_up, bytes_dn]} totals of all devices.
+        '''
+        return {dev: totals.copy() for dev, totals in self.last.items()}
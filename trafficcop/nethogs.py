@@ -0,0 +1,243 @@
+""" Parsing of nethogs trace output. """
+
+import logging
+import os
+import queue
+import subprocess
+import threading
+import time
+
+from typing import NamedTuple
+
+from . import utils
+
+# nethogs prints this line at the start of each refresh in trace mode.
+DELIMITER = 'Refreshing:'
+# Seconds between nethogs refreshes.
+DELAY = 1
+# Seconds to wait for a nethogs refresh before updating rates anyway.
+FRAME_TIMEOUT = 3 * DELAY
+
+
+def build_command(device, delay=DELAY):
+    # If no device is given, then all devices are monitored, which double-
+    # counts on gateway device plus tc device.
+    cmd = ['pkexec', 'nethogs', '-t', '-v2', '-d' + str(delay), device]
+    udp_support = utils.nethogs_supports_udp(utils.get_nethogs_version())
+    logging.debug(f"{udp_support=}")
+    if udp_support:
+        cmd.insert(2, '-C')
+    if os.geteuid() == 0:
+        # Already root, e.g. in collector mode.
+        cmd.remove('pkexec')
+    logging.debug(f"{cmd=}")
+    return cmd
+
+
+def stop(proc):
+    '''
+    Stop a nethogs process started with build_command(). Since it runs as root,
+    it has to be killed with pkexec, too.
+    '''
+    if proc.poll() is not None:
+        return
+    if os.geteuid() == 0:
+        proc.terminate()
+    else:
+        utils.run_command(['pkexec', 'kill', str(proc.pid)])
+
+
+class Frame(NamedTuple):
+    '''
+    One nethogs refresh, as parallel tuples with one item per process line.
+    '''
+    time: float
+    pids: tuple
+    exes: tuple
+    sent: tuple
+    recv: tuple
+
+    def lines(self):
+        return zip(self.pids, self.exes, self.sent, self.recv)
+
+
+def parse_line(line):
+    '''
+    Parse a trace line, "<exe>/<pid>/<uid>  <sent>  <received>" (separated by
+    tabs), into (pid, exe, sent, received). Return None if it is not a process
+    line. "exe" can contain spaces, e.g. "unknown TCP".
+    '''
+    fields = line.rsplit(None, 2)
+    if len(fields) != 3:
+        return None
+    name, sent, recv = fields
+    exe_pid_uid = name.rsplit('/', 2)
+    if len(exe_pid_uid) != 3:
+        return None
+    exe, pid, uid = exe_pid_uid
+    try:
+        return (int(pid), exe, int(float(sent)), int(float(recv)))
+    except ValueError:
+        return None
+
+
+class FrameParser():
+    '''
+    Collect nethogs trace lines into one Frame per refresh.
+    Since nethogs doesn't mark the end of a refresh, a frame is complete when
+    the next refresh begins, or when flush() is called.
+    '''
+    def __init__(self):
+        self.time = None
+        self.lines = []
+
+    def feed(self, line):
+        '''
+        Parse one line of output. Return the previous Frame if this line
+        begins a new refresh, otherwise None.
+        '''
+        line = line.rstrip()
+        if line == DELIMITER:
+            frame = self.flush()
+            self.time = time.monotonic()
+            return frame
+        if self.time is None:
+            # Startup messages before the first refresh.
+            logging.debug(f"nethogs: {line}")
+            return None
+        parsed = parse_line(line)
+        if parsed:
+            self.lines.append(parsed)
+        elif line:
+            logging.debug(f"Unparsed nethogs line: {line}")
+        return None
+
+    def flush(self):
+        '''
+        Return the Frame in progress, or None if no refresh has begun.
+        '''
+        if self.time is None:
+            return None
+        columns = tuple(zip(*self.lines)) or ((), (), (), ())
+        frame = Frame(self.time, *columns)
+        self.time = None
+        self.lines = []
+        return frame
+
+
+def merge_frames(old, new):
+    '''
+    Return a frame with all of the new frame's lines plus the lines of any
+    processes that are only in the old frame.
+    '''
+    keys = set(zip(new.pids, new.exes))
+    extra = [line for line in old.lines() if line[:2] not in keys]
+    if not extra:
+        return new
+    return Frame(new.time, *zip(*new.lines(), *extra))
+
+
+class FrameQueue():
+    '''
+    Hand-off of frames from the nethogs thread to the rates updater that holds
+    at most one pending frame, so it can't grow while nobody is reading it.
+    nethogs totals are cumulative, so a newer frame supersedes an older one
+    (counted in "dropped"), except for processes that are only in the older
+    frame, which are carried over into the newer one (counted in "merged").
+    Lines are only carried over from the frame that was put last, so those of
+    processes that have gone stay out of later frames.
+    '''
+    def __init__(self):
+        self.frame = None
+        # The last frame put, without the lines carried into it.
+        self.last = None
+        self.dropped = 0
+        self.merged = 0
+        self.cond = threading.Condition()
+
+    def put(self, frame):
+        with self.cond:
+            merged = frame
+            if self.frame is not None:
+                merged = merge_frames(self.last, frame)
+                if merged is frame:
+                    self.dropped += 1
+                else:
+                    self.merged += 1
+            self.frame = merged
+            self.last = frame
+            self.cond.notify_all()
+
+    def get(self, block=True, timeout=None):
+        '''
+        Return the pending frame. Raise queue.Empty if there is none (after
+        waiting, if block is True).
+        '''
+        with self.cond:
+            if block:
+                self.cond.wait_for(lambda: self.frame is not None, timeout)
+            if self.frame is None:
+                raise queue.Empty
+            frame = self.frame
+            self.frame = None
+            self.last = None
+            return frame
+
+    def wait(self, timeout=None):
+        '''
+        Block until a frame is pending. Return False if the timeout expired.
+        '''
+        with self.cond:
+            return self.cond.wait_for(lambda: self.frame is not None, timeout)
+
+    def empty(self):
+        return self.frame is None
+
+
+def read_to_queue(queue, tracker):
+    '''
+    Run nethogs on the tracker's device and put one Frame per refresh in the
+    queue. Runs in its own thread.
+    '''
+    # nethogs is restarted whenever the gateway device changes.
+    changed = threading.Event()
+    current = []
+
+    def on_device_changed(old, new):
+        changed.set()
+        for p in current:
+            stop(p)
+    tracker.connect(on_device_changed)
+
+    while True:
+        changed.clear()
+        device = tracker.device
+        if not device:
+            # No current connection.
+            changed.wait()
+            continue
+        cmd = build_command(device)
+        stdout = subprocess.PIPE
+        stderr = subprocess.STDOUT
+        with subprocess.Popen(
+            cmd,
+            stdout=stdout,
+            stderr=stderr,
+            encoding='utf-8'
+        ) as p:
+            current[:] = [p]
+            if changed.is_set():
+                # Device changed while starting.
+                stop(p)
+            parser = FrameParser()
+            while p.poll() is None:
+                # There is a long wait for each line: sometimes nearly 2
+                # seconds! Queue one frame per nethogs refresh.
+                frame = parser.feed(p.stdout.readline())
+                if frame:
+                    queue.put(frame)
+        current.clear()
+        if not changed.is_set():
+            logging.error(f"nethogs exited: {p.returncode}")
+            break
+        logging.info(f"Restarting nethogs on device: {tracker.device}")
@@ -0,0 +1,79 @@
+""" Process table used to attribute nethogs traffic to running processes. """
+
+import logging
+import os
+import psutil
+
+from typing import NamedTuple
+
+
+class ProcInfo(NamedTuple):
+    pid: int
+    create_time: float
+    name: str
+    exe: str
+    cmdline: list
+
+    @property
+    def key(self):
+        # A pid can be reused after its process exits; create_time can't.
+        return (self.pid, self.create_time)
+
+
+class ProcessTable():
+    '''
+    Persistent cache of process info, looked up by pid.
+    Entries are only read from /proc the first time a pid is seen. Each call
+    to refresh() diffs the current /proc pids against the cached ones and drops
+    entries for processes that have exited (or whose pid has been reused).
+    '''
+    def __init__(self, proc_dir='/proc'):
+        self.proc_dir = proc_dir
+        self.procs = {}
+
+    def list_pids(self):
+        return {int(d) for d in os.listdir(self.proc_dir) if d.isdigit()}
+
+    def refresh(self):
+        '''
+        Drop cached entries for exited processes. Return their keys.
+        '''
+        pids = self.list_pids()
+        dropped = []
+        for pid, info in list(self.procs.items()):
+            if pid in pids:
+                try:
+                    create_time = psutil.Process(pid).create_time()
+                except psutil.Error:
+                    create_time = None
+                if create_time == info.create_time:
+                    continue
+            dropped.append(info.key)
+            del self.procs[pid]
+        if dropped:
+            logging.debug(f"Dropped exited processes: {dropped}")
+        return dropped
+
+    def get(self, pid):
+        '''
+        Return ProcInfo for the given pid, or None if there is no such process.
+        '''
+        pid = int(pid)
+        info = self.procs.get(pid)
+        if info:
+            return info
+        attrs = ['create_time', 'name', 'exe', 'cmdline']
+        try:
+            d = psutil.Process(pid).as_dict(attrs=attrs, ad_value=None)
+        except psutil.Error:
+            return None
+        info = ProcInfo(
+            pid,
+            d.get('create_time'),
+            d.get('name'),
+            d.get('exe'),
+            d.get('cmdline'),
+        )
+        self.procs[pid] = info
+        logging.debug(f"Process info for pid {pid}: {info}")
+        return info
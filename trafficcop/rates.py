@@ -1,154 +1,182 @@
 """ Functions used to update bandwidth rates in GUI. """
 
 import logging
-import psutil
-import re
 import time
 
+from . import nethogs
 from . import utils
 
+# Store columns that show the rates.
+RATE_COLUMNS = [7, 8, 9, 10]
 
-def update_global_scope():
+
+def update_global_scope(counters):
     '''
     Update system bandwidth usage for the Global scope.
     '''
-    net_io = psutil.net_io_counters(pernic=True)
-    dev = utils.get_net_device()
-    if not dev:
-        # No current connection.
-        return [0, 0]
-    bytes_up = net_io[dev].bytes_sent
-    bytes_dn = net_io[dev].bytes_recv
+    # Running totals over the Global devices; [0, 0] if there's no connection.
+    bytes_up, bytes_dn = counters.read()
     return [bytes_up, bytes_dn]
 
 
-def update_scopes(scopes, queue, store):
+def update_scopes(scopes, queue, matcher, proc_table, scope_cache, counters):
     '''
     Retrieve items from nethogs queue and show updated download and upload
     rates.
     '''
-    # logging.debug(f"rates.update_scopes({scopes}, {queue}, {store})")
-    # Get time of current iteration.
-    epoch = time.time()
-
+    # logging.debug(f"rates.update_scopes({scopes}, {queue}, {matcher})")
     # Move current scopes dict's 'new' entries to 'last'.
     for scope in scopes.keys():
         scopes[scope]['last'] = scopes[scope]['now'].copy()
 
-    # Get fresh proc list.
-    proc_list = psutil.process_iter(attrs=['name', 'exe', 'cmdline'])
+    # Forget processes that have exited since the last iteration.
+    dropped = proc_table.refresh()
+    scope_cache.discard(dropped)
+    for data in scopes.values():
+        for pid, create_time in dropped:
+            data['pids'].pop(pid, None)
 
-    # Update scopes dict 'new' entries.
+    # Gather the latest nethogs totals for each pid, grouped by scope.
+    pid_totals = {}
+    frame_time = None
     while not queue.empty():
-        line = queue.get().split()
-        logging.debug(f"nethogs line: {line}")
-        if line[0] == 'unknown':
-            exe_pid_usr = line[1]
-        else:
-            exe_pid_usr = line[0]
-        b_up = int(float(line[-2]))
-        b_dn = int(float(line[-1]))
-        if b_up == 0 and b_dn == 0:
-            # No traffic to track.
-            logging.debug("Not updating GUI for 0-byte traffic.")
-            continue
-        scope = match_cmdline_to_scope(exe_pid_usr, store, proc_list)
-        if not scope:
-            # Not matched; will be counted in 'Global'.
-            continue
+        frame = queue.get()
+        logging.debug(f"nethogs frame: {frame}")
+        # Scope rates are timed by the nethogs refresh, not by this update.
+        frame_time = frame.time
+        for pid, exe, b_up, b_dn in frame.lines():
+            if b_up == 0 and b_dn == 0:
+                # No traffic to track.
+                logging.debug("Not updating GUI for 0-byte traffic.")
+                continue
+            scope = match_pid_to_scope(
+                exe,
+                pid,
+                matcher,
+                proc_table,
+                scope_cache,
+            )
+            if not scope:
+                # Not matched; will be counted in 'Global'.
+                continue
+            pid_totals.setdefault(scope, {})[pid] = [b_up, b_dn]
+
+    # Update scopes dict 'now' entries.
+    for scope, totals in pid_totals.items():
         if scope not in scopes.keys():
-            # Initialize scopes[scope].
-            scopes[scope] = {
-                'last': {
-                    'time': None,
-                    'bytes_up': None,
-                    'bytes_dn': None,
-                },
-                'now': {}
-            }
-
-        # Add epoch time to 'now'.
-        scopes[scope]['now']['time'] = epoch
-        # Update bytes for current scope.
-        scopes[scope]['now']['bytes_up'] = b_up
-        scopes[scope]['now']['bytes_dn'] = b_dn
+            scopes[scope] = new_scope_data()
+        move_pid_baselines(scopes, scope, totals)
+        aggregate_scope(scopes[scope], totals, frame_time)
+    # Scopes without traffic in this refresh still get a new sample, so
+    # their rates fall to 0. If nethogs has gone quiet (or exited), scopes
+    # that haven't had a sample for a while get one now.
+    now = time.monotonic()
+    for scope, data in scopes.items():
+        if scope == 'Global' or scope in pid_totals or not data['now']:
+            continue
+        if frame_time is not None:
+            data['now']['time'] = frame_time
+        elif now - data['now']['time'] >= nethogs.FRAME_TIMEOUT:
+            data['now']['time'] = now
 
     # Update Global scope.
-    b_up, b_dn = update_global_scope()
+    b_up, b_dn = update_global_scope(counters)
     if 'Global' not in scopes.keys():
-        scopes['Global'] = {
-                'last': {
-                    'time': None,
-                    'bytes_up': None,
-                    'bytes_dn': None,
-                },
-                'now': {}
-        }
-    scopes['Global']['now']['time'] = epoch
+        scopes['Global'] = new_scope_data()
+    scopes['Global']['now']['time'] = time.monotonic()
     scopes['Global']['now']['bytes_up'] = b_up
     scopes['Global']['now']['bytes_dn'] = b_dn
+    scopes['Global']['devices'] = counters.breakdown()
 
     logging.debug(f"Updated data: {scopes}")
     return scopes
 
 
-def get_proc_info_from_pid(pid, proc_list):
-    # Match pid to process_iter.
-    proc_info = {}
-    for p in proc_list:
-        try:
-            p_pid = str(p.pid)
-        except psutil.NoSuchProcess:
-            continue
-        if p_pid == pid:
-            proc_info = p.info
-            break
-    logging.debug(f"Process info for pid {pid}: {proc_info}")
-    return proc_info
-
-
-def get_configured_scopes(store):
-    # Get scope names, match-type, and match-str from store.
-    scopes = {}
-    for row in store:
-        if row[0] in ['Global', 'unknown TCP', 'unknown UDP']:
-            continue
-        scopes[row[0]] = row[11:]
-    logging.debug(f"Configured scopes: {scopes}")
+def update_scopes_from_snapshot(scopes, snapshot):
+    '''
+    Update the scopes dict with the 'now' entries of a collector snapshot.
+    '''
+    for data in scopes.values():
+        data['last'] = data['now'].copy()
+    for scope, now in snapshot.get('scopes', {}).items():
+        if scope not in scopes:
+            scopes[scope] = new_scope_data()
+        scopes[scope]['now'] = dict(now)
+    if 'Global' in scopes:
+        scopes['Global']['devices'] = snapshot.get('devices', {})
     return scopes
 
 
-def match_proc_to_scope(proc, scopes):
-    scope = None
-    for s, data in scopes.items():
-        if data[0] == 'name' or data[0] == 'cmdline':
-            # Check if scope 'name' or 'cmdline' matches proc 'name' or
-            # 'cmdline'.
-            target_string = proc[data[0]]
-            if data[0] == 'cmdline':
-                # cmdline property from psutil given as list instead of string.
-                target_string = ' '.join(proc[data[0]])
-            msg = f"Checking if \"{data[1]}\" matches \"{target_string}\""
-            logging.debug(msg)
-            match = re.match(data[1], target_string)
-            if match:
-                scope = s
-                break
-        elif data[0] == 'exe':
-            # See if scope exe equals proc exe.
-            logging.debug(f"Checking if \"{data[1]}\" = \"{proc[data[0]]}\"")
-            if data[1] == proc[data[0]]:
-                scope = s
+def new_scope_data():
+    return {
+        'last': {
+            'time': None,
+            'bytes_up': None,
+            'bytes_dn': None,
+        },
+        'now': {},
+        # Latest nethogs [bytes_up, bytes_dn] totals of each of the scope's
+        # pids.
+        'pids': {},
+    }
+
+
+def move_pid_baselines(scopes, scope, totals):
+    '''
+    Move the nethogs totals of pids that are now matched to the given scope
+    (e.g. after the config was reloaded) from the scope they were in before.
+    '''
+    data = scopes[scope]
+    for pid in totals:
+        if pid in data['pids']:
+            continue
+        for other in scopes.values():
+            if pid in other['pids']:
+                data['pids'][pid] = other['pids'].pop(pid)
                 break
-        else:
-            # Unhandled match-type.
-            logging.warning(f"Unhandled match-type for scope: '{s}: {data}'")
+
+
+def aggregate_scope(data, totals, epoch):
+    '''
+    Add the traffic of all of a scope's pids since the last iteration to the
+    scope's running byte totals. A pid's first totals are only its baseline:
+    nethogs has been counting its traffic since before it was matched.
+    '''
+    delta_up = 0
+    delta_dn = 0
+    for pid, (b_up, b_dn) in totals.items():
+        if pid not in data['pids']:
+            data['pids'][pid] = [b_up, b_dn]
             continue
-    logging.debug(f"Process \"{proc}\" matched to scope \"{scope}\"")
-    return scope
+        last_up, last_dn = data['pids'][pid]
+        # nethogs totals only go down if nethogs itself has been restarted.
+        delta_up += b_up - last_up if b_up >= last_up else b_up
+        delta_dn += b_dn - last_dn if b_dn >= last_dn else b_dn
+        data['pids'][pid] = [b_up, b_dn]
+    data['now']['time'] = epoch
+    data['now']['bytes_up'] = data['now'].get('bytes_up', 0) + delta_up
+    data['now']['bytes_dn'] = data['now'].get('bytes_dn', 0) + delta_dn
+    return data
+
+
+def get_pid_totals(scopes, scope):
+    '''
+    Return the latest {pid: [bytes_up, bytes_dn]} totals of the given scope.
+    '''
+    data = scopes.get(scope, {})
+    return {pid: t.copy() for pid, t in data.get('pids', {}).items()}
 
 
-def match_cmdline_to_scope(exe_pid_usr, store, proc_list):
+def get_device_totals(scopes):
+    '''
+    Return the latest {device: [bytes_up, bytes_dn]} totals of the devices that
+    make up the Global scope.
+    '''
+    data = scopes.get('Global', {})
+    return {d: t.copy() for d, t in data.get('devices', {}).items()}
+
+
+def match_pid_to_scope(exe, pid, matcher, proc_table, scope_cache):
     """
     Return Traffic Cop scope that matches pid of each line of nethogs output.
     This scope is used for displaying each process' traffic in the Traffic Cop
@@ -159,60 +187,62 @@ def match_cmdline_to_scope(exe_pid_usr, store, proc_list):
     - unknown UDP
     - other configured processes
     """
-    logging.debug(f"Attempting to match traffic from: {exe_pid_usr}")
-    # Strip pid and user from cmdline.
-    cmdline_list = exe_pid_usr.split('/')
-    # "exe" can be the path to an executable or "TCP"/"UDP".
-    exe = '/'.join(cmdline_list[:-2])
-    logging.debug(f"{exe=}")
-    # "pid" will be "0" if "exe" is "TCP" or "UDP".
-    pid = cmdline_list[-2]
-    logging.debug(f"{pid=}")
-
+    # "exe" can be the path to an executable or "unknown TCP"/"unknown UDP".
+    # "pid" will be 0 if "exe" is "unknown TCP" or "unknown UDP".
+    logging.debug(f"Attempting to match traffic from: {exe=}; {pid=}")
     scope = None
-    if exe == 'TCP':
-        scope = 'unknown TCP'
-    elif exe == 'UDP':
-        scope = 'unknown UDP'
+    if exe in ['unknown TCP', 'unknown UDP']:
+        scope = exe
     else:
-        # Match pid to process_iter.
-        matched_proc = get_proc_info_from_pid(pid, proc_list)
+        # Look up pid in the process table.
+        matched_proc = proc_table.get(pid)
         if matched_proc:
-            # Get scope names, match-type, and match-str from store.
-            scopes = get_configured_scopes(store)
-            if scopes:
-                scope = match_proc_to_scope(matched_proc, scopes)
-    msg = f"nethogs line \"{exe_pid_usr}\" matched to scope \"{scope}\""
+            scope = scope_cache.lookup(matched_proc, matcher)
+    msg = f"nethogs process \"{exe}/{pid}\" matched to scope \"{scope}\""
     logging.debug(msg)
     return scope
 
 
+def format_rate_cells(values):
+    '''
+    Return the text of the rate and unit cells for [rate, unit, rate, unit].
+    Zero or missing rates are shown as blank cells.
+    '''
+    cells = [' '*4] * 4
+    if values and values[0] > 0:
+        cells[0:2] = [f"{values[0]:.0f}", values[1]]
+    if values and values[2] > 0:
+        cells[2:4] = [f"{values[2]:.0f}", values[3]]
+    return cells
+
+
 def update_store_rates(store, rates_dict):
-    # WARNING: This assumes the scopes in rates_dict are the same as those in
-    # store. In other words it assumes that the store hasn't changed.
+    '''
+    Show new rates in one pass over the store's indexed rows, only setting the
+    cells whose text has changed. Rows of scopes that have no current rates
+    are cleared.
+    '''
     logging.debug(f"New bandwidth rates for GUI: {rates_dict}")
-    for row in store:
-        for scope, values in rates_dict.items():
-            if row[0] == scope:
-                logging.debug(f"{values=}")
-                if values[0] <= 0:
-                    row[7] = ' '*4
-                    row[8] = ' '*4
-                else:
-                    # row[7] = '{:.0f}'.format(values[0])
-                    row[7] = f"{values[0]:.0f}"
-                    row[8] = values[1]
-                if values[2] <= 0:
-                    row[9] = ' '*4
-                    row[10] = ' '*4
-                else:
-                    # row[9] = '{:.0f}'.format(values[2])
-                    row[9] = f"{values[2]:.0f}"
-                    row[10] = values[3]
-                break
+    for scope, ref in store.row_refs.items():
+        if not ref.valid():
+            continue
+        treeiter = store.get_iter(ref.get_path())
+        cells = format_rate_cells(rates_dict.get(scope))
+        shown = store.get(treeiter, *RATE_COLUMNS)
+        changed = [
+            (col, cell) for col, cell, old in zip(RATE_COLUMNS, cells, shown)
+            if cell != old
+        ]
+        if changed:
+            columns, values = zip(*changed)
+            store.set(treeiter, list(columns), list(values))
 
 
 def calculate_data_rates(data):
+    '''
+    Return [rate_dn, rate_up] in B/s from the change in the scope's running
+    byte totals between 'last' and 'now'.
+    '''
     t1 = data['now']['time']
     t0 = data['last']['time']
     u1 = data['now']['bytes_up']
@@ -231,3 +261,46 @@ def calculate_data_rates(data):
         rate_up = bytes_up / elapsed
         rate_dn = bytes_dn / elapsed
     return [rate_dn, rate_up]
+
+
+def get_scope_rates(scopes, rate_history=None):
+    '''
+    Return {scope: [rate_dn, rate_up]} in B/s for each scope with two samples.
+    If a RateHistory is given, its smoothed rates are used.
+    '''
+    scope_rates = {}
+    for scope, data in scopes.items():
+        logging.debug(f"{scope=}")
+        logging.debug(f"{data=}")
+        # if not data['last']['time']:
+        if (
+            None in data.get('last').values() or
+            None in data.get('now').values()
+        ):
+            continue
+
+        data_rates = None
+        if rate_history:
+            data_rates = rate_history.get_rates(scope)
+        if not data_rates:
+            data_rates = calculate_data_rates(data)
+        if None in data_rates:
+            continue
+        scope_rates[scope] = data_rates
+    return scope_rates
+
+
+def get_rates_dict(scopes, rate_history=None):
+    '''
+    Return {scope: [rate, unit, rate, unit]} for each scope with two samples.
+    If a RateHistory is given, its smoothed rates are used.
+    '''
+    rates_dict = {}
+    for scope, data_rates in get_scope_rates(scopes, rate_history).items():
+        # Adjust the number to only show 3 digits; change units as
+        # necessary (KB/s, MB/s, GB/s).
+        human_up = utils.convert_bytes_to_human(data_rates[0])
+        human_dn = utils.convert_bytes_to_human(data_rates[1])
+        rates_dict[scope] = [*human_up, *human_dn]
+    logging.debug(f"{rates_dict=}")
+    return rates_dict
@@ -0,0 +1,121 @@
+""" Cell renderer that draws the recent rate history of a scope. """
+
+import cairo
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import GObject   # noqa: E402
+from gi.repository import Gtk       # noqa: E402
+
+# Number of samples shown, and pixels per sample.
+SAMPLES = 60
+STEP = 2
+HEIGHT = 20
+COLOR_DN = (0.21, 0.52, 0.89)
+COLOR_UP = (0.90, 0.38, 0.00)
+
+
+def set_scope(column, cell, model, treeiter, data=None):
+    '''
+    Cell data function: show the history of the row's scope.
+    '''
+    cell.set_property('scope', model.get_value(treeiter, 0))
+
+
+class SparklineRenderer(Gtk.CellRenderer):
+    '''
+    Draws the last SAMPLES rates of the scope in its "scope" property, with
+    download as a filled area and upload as a line.
+    Each scope's drawing is cached on a surface together with the history
+    version it shows, so rows are only redrawn when their history changes.
+    '''
+    scope = GObject.Property(type=str, default='')
+
+    def __init__(self, rate_history):
+        super().__init__()
+        self.rate_history = rate_history
+        # {scope: (key, surface)}
+        self.surfaces = {}
+
+    def get_samples(self, history):
+        return (
+            history.ordered(history.rates_dn)[-SAMPLES:],
+            history.ordered(history.rates_up)[-SAMPLES:],
+        )
+
+    def get_key(self, history):
+        '''
+        Return what the scope's drawing depends on.
+        '''
+        rates_dn, rates_up = self.get_samples(history)
+        if max(rates_dn, default=0) == 0 and max(rates_up, default=0) == 0:
+            # A flat line looks the same at any version.
+            return 'flat'
+        return history.version
+
+    def refresh(self, store):
+        '''
+        Emit row-changed for each row whose drawing is out of date.
+        '''
+        for scope in list(self.surfaces):
+            if scope not in store.row_refs:
+                del self.surfaces[scope]
+        for scope, ref in store.row_refs.items():
+            history = self.rate_history.scopes.get(scope)
+            if not history or not ref.valid():
+                continue
+            cached = self.surfaces.get(scope)
+            if cached and cached[0] == self.get_key(history):
+                continue
+            path = ref.get_path()
+            store.row_changed(path, store.get_iter(path))
+        return False
+
+    def draw(self, history):
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, SAMPLES*STEP, HEIGHT)
+        cr = cairo.Context(surface)
+        rates_dn, rates_up = self.get_samples(history)
+        peak = max(max(rates_dn, default=0), max(rates_up, default=0))
+        # Right-align the samples so the newest is always at the end.
+        x0 = (SAMPLES - len(rates_dn)) * STEP
+
+        def y(rate):
+            if peak <= 0:
+                return HEIGHT - 0.5
+            return HEIGHT - 0.5 - (HEIGHT - 2) * rate / peak
+
+        if rates_dn:
+            cr.move_to(x0, HEIGHT)
+            for i, rate in enumerate(rates_dn):
+                cr.line_to(x0 + i*STEP, y(rate))
+            cr.line_to(x0 + (len(rates_dn) - 1)*STEP, HEIGHT)
+            cr.close_path()
+            cr.set_source_rgba(*COLOR_DN, 0.6)
+            cr.fill()
+
+        if rates_up:
+            cr.move_to(x0, y(rates_up[0]))
+            for i, rate in enumerate(rates_up):
+                cr.line_to(x0 + i*STEP, y(rate))
+            cr.set_source_rgb(*COLOR_UP)
+            cr.set_line_width(1)
+            cr.stroke()
+        return surface
+
+    def do_get_size(self, widget, cell_area):
+        xpad, ypad = self.get_padding()
+        return (0, 0, SAMPLES*STEP + 2*xpad, HEIGHT + 2*ypad)
+
+    def do_render(self, cr, widget, background_area, cell_area, flags):
+        history = self.rate_history.scopes.get(self.scope)
+        if not history:
+            return
+        key = self.get_key(history)
+        cached = self.surfaces.get(self.scope)
+        if not cached or cached[0] != key:
+            cached = (key, self.draw(history))
+            self.surfaces[self.scope] = cached
+        xpad, ypad = self.get_padding()
+        y = cell_area.y + ypad + max(cell_area.height - 2*ypad - HEIGHT, 0) / 2
+        cr.set_source_surface(cached[1], cell_area.x + xpad, y)
+        cr.paint()
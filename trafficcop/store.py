@@ -0,0 +1,146 @@
+""" GTK ListStore and TreeView of the config. """
+
+import gi
+import logging
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk       # noqa: E402
+
+from . import model                 # noqa: E402
+from . import sparkline             # noqa: E402
+
+
+class ConfigStore(Gtk.ListStore):
+    '''
+    ListStore view of a ConfigModel, with one row per configured scope.
+    '''
+    def __init__(self):
+        super().__init__(
+            str, str, str, str, str, int,
+            int, str, str, str, str, str, str,
+        )
+        self.model = model.ConfigModel()
+        self.row_refs = {}
+
+    @property
+    def matcher(self):
+        return self.model.matcher
+
+    def index_rows(self):
+        '''
+        Map each scope name to a reference to its row, which stays valid as
+        other rows are added or removed.
+        '''
+        self.row_refs = {
+            row[0]: Gtk.TreeRowReference.new(self, row.path) for row in self
+        }
+
+
+def create_config_treeview(store, sparklines=None):
+    '''
+    Return the TreeView of the config store. If a SparklineRenderer is given,
+    a column with the recent rate history of each scope is added.
+    '''
+    tree = Gtk.TreeView(model=store)
+    r_left = Gtk.CellRendererText()
+    r_left.set_alignment(0.0, 0.0)
+    r_center = Gtk.CellRendererText()
+    r_center.set_alignment(0.5, 0.0)
+    r_right = Gtk.CellRendererText()
+    r_right.set_alignment(1.0, 0.0)
+
+    # Configure columns.
+    c_name = Gtk.TreeViewColumn("Process", r_left, text=0)
+    c_name.set_sort_column_id(0)
+
+    up = '\u2191'
+    dn = '\u2193'
+    c_dn_max = Gtk.TreeViewColumn(f"Max {dn}", r_right, text=1)
+    c_up_max = Gtk.TreeViewColumn(f"Max {up}", r_right, text=2)
+    c_dn_min = Gtk.TreeViewColumn(f"Min {dn}", r_right, text=3)
+    c_up_min = Gtk.TreeViewColumn(f"Min {up}", r_right, text=4)
+    rates = [c_dn_max, c_up_max, c_dn_min, c_up_min]
+    for r in rates:
+        r.set_fixed_width(80)
+
+    c_dn_pri = Gtk.TreeViewColumn(f"Priority {dn}", r_center, text=5)
+    c_dn_pri.set_sort_column_id(5)
+    c_up_pri = Gtk.TreeViewColumn(f"Priority {up}", r_center, text=6)
+    c_up_pri.set_sort_column_id(6)
+
+    c_dn_rt = Gtk.TreeViewColumn(f"Rate {dn}", r_right, text=7)
+    c_dn_u = Gtk.TreeViewColumn("", r_left, text=8)
+    c_dn_u.set_fixed_width(40)
+
+    c_up_rt = Gtk.TreeViewColumn(f"Rate {up}", r_right, text=9)
+    c_up_u = Gtk.TreeViewColumn("", r_left, text=10)
+    c_up_u.set_fixed_width(40)
+    tree.append_column(c_name)
+    c_list = [c_dn_max, c_up_max, c_dn_min, c_up_min, c_dn_pri, c_up_pri]
+    for c in c_list:
+        c.set_alignment(0.5)    # set title alignment
+        c.set_expand(True)      # expand when window is wider than necessary
+        tree.append_column(c)
+    tree.append_column(c_dn_rt)
+    tree.append_column(c_dn_u)
+    tree.append_column(c_up_rt)
+    tree.append_column(c_up_u)
+    if sparklines:
+        c_graph = Gtk.TreeViewColumn("History", sparklines)
+        c_graph.set_cell_data_func(sparklines, sparkline.set_scope)
+        tree.append_column(c_graph)
+    return tree
+
+
+def update_config_store(store, new_store):
+    return apply_model(store, new_store.model)
+
+
+def apply_model(store, config_model):
+    '''
+    Change the store's rows to show the given model, touching only the rows
+    of scopes that were added, changed or removed.
+    '''
+    changes = model.diff_models(store.model, config_model)
+    for name in changes.removed:
+        ref = store.row_refs.pop(name)
+        store.remove(store.get_iter(ref.get_path()))
+    for name, values in changes.updated:
+        treeiter = store.get_iter(store.row_refs[name].get_path())
+        store.set(treeiter, list(range(1, 7)), list(values))
+    for previous, row in changes.added:
+        if previous is None:
+            treeiter = store.prepend(list(row))
+        else:
+            path = store.row_refs[previous].get_path()
+            treeiter = store.insert_after(store.get_iter(path), list(row))
+        path = store.get_path(treeiter)
+        store.row_refs[row[0]] = Gtk.TreeRowReference.new(store, path)
+    logging.debug(
+        f"Config store changes: {len(changes.removed)} removed,"
+        f" {len(changes.updated)} updated, {len(changes.added)} added"
+    )
+    # The rows now show the new config.
+    store.model = config_model
+    return store
+
+
+def convert_yaml_to_store(f, test=False):
+    config_model = model.load_config(f, test)
+    if not config_model:
+        return ''
+    return convert_model_to_store(config_model)
+
+
+def convert_dict_to_store(data_dict):
+    return convert_model_to_store(model.ConfigModel.from_dict(data_dict))
+
+
+def convert_model_to_store(config_model):
+    store = ConfigStore()
+    for row in config_model.rows:
+        logging.debug(f"New ListStore line: {row}")
+        store.append(list(row))
+    store.model = config_model
+    store.index_rows()
+    return store
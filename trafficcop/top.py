@@ -0,0 +1,247 @@
+""" Terminal view of the current rates of each scope. """
+# Nothing here may import gi, so that it starts quickly without a display,
+# e.g. over SSH.
+
+import argparse
+import curses
+import logging
+import os
+import sys
+import threading
+import time
+import yaml
+
+from . import client
+from . import config
+from . import history
+from . import matcher
+from . import model
+from . import netdev
+from . import nethogs
+from . import procs
+from . import rates
+from . import utils
+
+# Width of the scope column.
+SCOPE_WIDTH = 24
+# Seconds of history that peak rates are taken from.
+PEAK_SECONDS = 60
+
+
+def format_rate(rate):
+    value, unit = utils.convert_bytes_to_human(rate)
+    return f"{value:.0f} {unit}"
+
+
+def format_rows(scope_stats, history_stats={}):
+    '''
+    Return the lines of the rates table for {scope: ScopeStats}: Global first,
+    then the other scopes from the highest total rate to the lowest, with the
+    peak rates from {scope: history.Stats}.
+    '''
+    lines = [
+        f"{'SCOPE':<{SCOPE_WIDTH}} {'DOWN':>10} {'UP':>10}"
+        f" {'PEAK DOWN':>10} {'PEAK UP':>10}"
+    ]
+    stats = sorted(
+        scope_stats.values(),
+        key=lambda s: (s.name != 'Global', -(s.rate_dn + s.rate_up)),
+    )
+    for s in stats:
+        name = s.name[:SCOPE_WIDTH]
+        dn = format_rate(s.rate_dn)
+        up = format_rate(s.rate_up)
+        peaks = history_stats.get(s.name)
+        peak_dn = format_rate(peaks.peak_dn if peaks else 0)
+        peak_up = format_rate(peaks.peak_up if peaks else 0)
+        lines.append(
+            f"{name:<{SCOPE_WIDTH}} {dn:>10} {up:>10}"
+            f" {peak_dn:>10} {peak_up:>10}"
+        )
+    return lines
+
+
+class Top():
+    '''
+    Source of the per-scope rates shown in the terminal: a running collector's
+    snapshots, or else nethogs run in this process, which needs root.
+    '''
+    def __init__(
+        self,
+        config_file=config.CONFIG_FILE,
+        socket_path=None,
+        interfaces=None,
+        interval=1.0,
+    ):
+        self.config_file = config_file
+        self.interfaces = interfaces
+        self.subscription = client.Subscription(socket_path)
+        self.rate_history = history.RateHistory(PEAK_SECONDS, interval)
+        self.scopes = {}
+        self.device = None
+        self.local = False
+
+    def start(self):
+        '''
+        Return False if there is no collector and nethogs can't be run here.
+        '''
+        self.subscription.latest()
+        if self.subscription.connected:
+            return True
+        if os.geteuid() != 0:
+            return False
+        self.start_nethogs()
+        return True
+
+    def start_nethogs(self):
+        self.local = True
+        self.subscription.close()
+        try:
+            self.matcher = config.load_matcher(self.config_file)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            logging.error(f"Only showing Global and unknown scopes: {e}")
+            self.matcher = matcher.ScopeMatcher([])
+        self.queue = nethogs.FrameQueue()
+        self.proc_table = procs.ProcessTable()
+        self.scope_cache = matcher.ScopeCache()
+        self.device_tracker = netdev.DeviceTracker(interfaces=self.interfaces)
+        devices = self.device_tracker.devices
+        self.global_counters = netdev.GlobalCounters(devices)
+        threading.Thread(
+            name='T-nh',
+            target=nethogs.read_to_queue,
+            args=(self.queue, self.device_tracker),
+            daemon=True,
+        ).start()
+
+    def update(self):
+        '''
+        Return the current {scope: ScopeStats}.
+        '''
+        if self.local:
+            self.device_tracker.poll()
+            self.global_counters.set_devices(self.device_tracker.devices)
+            self.device = self.device_tracker.device
+            self.scopes = rates.update_scopes(
+                self.scopes,
+                self.queue,
+                self.matcher,
+                self.proc_table,
+                self.scope_cache,
+                self.global_counters,
+            )
+        else:
+            snapshot = self.subscription.latest()
+            if snapshot:
+                self.device = snapshot.get('device')
+                self.scopes = rates.update_scopes_from_snapshot(
+                    self.scopes,
+                    snapshot,
+                )
+        self.rate_history.add_samples(self.scopes)
+        return model.get_scope_stats(self.scopes, self.rate_history)
+
+    def get_lines(self):
+        scope_stats = self.update()
+        source = 'nethogs' if self.local else 'collector'
+        title = f"traffic-cop  device: {self.device}  source: {source}"
+        history_stats = self.rate_history.stats()
+        return [title, '', *format_rows(scope_stats, history_stats)]
+
+
+def run_curses(stdscr, top, interval):
+    try:
+        curses.curs_set(0)
+    except curses.error:
+        pass
+    stdscr.timeout(int(interval * 1000))
+    while True:
+        lines = top.get_lines()
+        lines[0] += "  (q to quit)"
+        stdscr.erase()
+        height, width = stdscr.getmaxyx()
+        for y, line in enumerate(lines[:height]):
+            stdscr.addnstr(y, 0, line, width - 1)
+        stdscr.refresh()
+        if stdscr.getch() in [ord('q'), ord('Q'), 27]:
+            return
+
+
+def run_plain(top, interval, count=None):
+    # The first update only sets the baseline.
+    top.update()
+    n = 0
+    while count is None or n < count:
+        time.sleep(interval)
+        print('\n'.join(top.get_lines()) + '\n', flush=True)
+        n += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='traffic-cop --top',
+        description="Show the current rates of each scope in the terminal.",
+    )
+    parser.add_argument(
+        '--top', action='store_true',
+        help=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        '-d', '--debug', action='store_true',
+        help="Log DEBUG info.",
+    )
+    parser.add_argument(
+        '-i', '--interval', type=float, default=1.0, metavar='SECONDS',
+        help="Seconds between updates (default: 1).",
+    )
+    parser.add_argument(
+        '-I', '--interfaces', metavar='IFACES',
+        help="Comma-separated devices counted in Global (default: all"
+        " gateway devices).",
+    )
+    parser.add_argument(
+        '-n', '--count', type=int, metavar='N',
+        help="Print N updates as plain text, then exit.",
+    )
+    parser.add_argument(
+        '--plain', action='store_true',
+        help="Print plain text instead of using curses (default if output"
+        " is not a terminal).",
+    )
+    parser.add_argument(
+        '--socket', metavar='PATH',
+        help="Socket of the collector to get rates from (default: the"
+        " running one, if any).",
+    )
+    parser.add_argument(
+        '--config', default=config.CONFIG_FILE, metavar='FILE',
+        help="Config file to match scopes by, without a collector (default:"
+        f" {config.CONFIG_FILE}).",
+    )
+    args = parser.parse_args(argv)
+
+    plain = args.plain or args.count is not None or not sys.stdout.isatty()
+    log_level = logging.DEBUG if args.debug else logging.INFO
+    utils.set_up_logging(log_level, console=plain)
+    interfaces = None
+    if args.interfaces:
+        ifaces = args.interfaces.split(',')
+        interfaces = [i.strip() for i in ifaces if i.strip()]
+
+    top = Top(args.config, args.socket, interfaces, args.interval)
+    if not top.start():
+        print(
+            "No collector is running, and nethogs needs root. Run"
+            " \"sudo traffic-cop --top\" or start a collector with"
+            " \"traffic-cop --collector\".",
+            file=sys.stderr,
+        )
+        return 1
+    try:
+        if plain:
+            run_plain(top, args.interval, args.count)
+        else:
+            curses.wrapper(run_curses, top, args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,222 @@
+""" Tray indicator showing the current Global and top-scope rates. """
+
+import argparse
+import gi
+import importlib
+import logging
+import os
+import subprocess
+import time
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import GLib      # noqa: E402
+from gi.repository import Gtk       # noqa: E402
+
+from . import client                # noqa: E402
+from . import history               # noqa: E402
+from . import netdev                # noqa: E402
+from . import utils                 # noqa: E402
+
+# Seconds between polls; also the shortest allowed interval.
+POLL_INTERVAL = 1.0
+# Number of top scopes listed in the menu.
+TOP_SCOPES = 3
+
+
+def get_app_indicator():
+    '''
+    Return the AppIndicator module if one is installed, or None.
+    '''
+    for name in ['AyatanaAppIndicator3', 'AppIndicator3']:
+        try:
+            gi.require_version(name, '0.1')
+            return importlib.import_module(f"gi.repository.{name}")
+        except (ValueError, ImportError):
+            continue
+    return None
+
+
+def format_rates(data_rates):
+    '''
+    Return "↓ <rate> ↑ <rate>" text for [rate_dn, rate_up].
+    '''
+    rate_dn, rate_up = data_rates or [0, 0]
+    dn = utils.convert_bytes_to_human(rate_dn)
+    up = utils.convert_bytes_to_human(rate_up)
+    return f"↓ {dn[0]:.0f} {dn[1]}  ↑ {up[0]:.0f} {up[1]}"
+
+
+def get_top_scopes(rates_by_scope, count=TOP_SCOPES):
+    '''
+    Return [(scope, [rate_dn, rate_up])] of the busiest non-Global scopes.
+    '''
+    busy = [
+        (scope, r) for scope, r in rates_by_scope.items()
+        if scope != 'Global' and r and sum(r) > 0
+    ]
+    busy.sort(key=lambda item: sum(item[1]), reverse=True)
+    return busy[:count]
+
+
+class Tray():
+    '''
+    Indicator that shows the Global rates, and the busiest scopes in its menu.
+    If a collector is running, its snapshots are used. Otherwise only Global
+    is shown, from the device counters, since scopes need nethogs (and root).
+    It doesn't load the glade UI or the config store, and polls once per
+    interval.
+    '''
+    def __init__(self, socket_path=None, interval=POLL_INTERVAL):
+        self.interval = max(interval, POLL_INTERVAL)
+        self.subscription = client.Subscription(socket_path)
+        self.device_tracker = None
+        self.global_counters = None
+        self.rate_history = history.RateHistory(60, self.interval)
+
+        self.menu = Gtk.Menu()
+        self.item_global = Gtk.MenuItem(label=format_rates(None))
+        self.item_global.set_sensitive(False)
+        self.menu.append(self.item_global)
+        self.menu.append(Gtk.SeparatorMenuItem())
+        self.scope_items = []
+        for i in range(TOP_SCOPES):
+            item = Gtk.MenuItem(label='')
+            item.set_sensitive(False)
+            item.set_no_show_all(True)
+            self.scope_items.append(item)
+            self.menu.append(item)
+        item_open = Gtk.MenuItem(label="Open Traffic Cop")
+        item_open.connect('activate', self.on_open)
+        self.menu.append(item_open)
+        item_quit = Gtk.MenuItem(label="Quit")
+        item_quit.connect('activate', Gtk.main_quit)
+        self.menu.append(item_quit)
+        self.menu.show_all()
+
+        self.icon = None
+        self.indicator = None
+        # Use an AppIndicator if available, otherwise a StatusIcon.
+        AppIndicator = get_app_indicator()
+        if AppIndicator:
+            self.indicator = AppIndicator.Indicator.new(
+                'traffic-cop',
+                'traffic-cop',
+                AppIndicator.IndicatorCategory.SYSTEM_SERVICES,
+            )
+            self.indicator.set_status(AppIndicator.IndicatorStatus.ACTIVE)
+            self.indicator.set_menu(self.menu)
+        else:
+            self.icon = Gtk.StatusIcon.new_from_icon_name('traffic-cop')
+            self.icon.connect('popup-menu', self.on_popup)
+
+    def start(self):
+        self.poll()
+        GLib.timeout_add(int(self.interval * 1000), self.poll)
+
+    def on_open(self, item):
+        proc = subprocess.Popen(['traffic-cop'])
+        # Reap the window's process when it's closed.
+        GLib.child_watch_add(
+            GLib.PRIORITY_DEFAULT,
+            proc.pid,
+            self.on_closed,
+            proc,
+        )
+
+    def on_closed(self, pid, status, proc):
+        # GLib has reaped it; keep subprocess from trying again.
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        logging.debug(f"Window process {pid} exited: {proc.returncode}")
+
+    def on_popup(self, icon, button, activate_time):
+        self.menu.popup(None, None, None, None, button, activate_time)
+
+    def read_counters(self):
+        '''
+        Return a snapshot with only the Global rates, from the device counters.
+        '''
+        if not self.device_tracker:
+            self.device_tracker = netdev.DeviceTracker()
+            devices = self.device_tracker.devices
+            self.global_counters = netdev.GlobalCounters(devices)
+        self.device_tracker.poll()
+        self.global_counters.set_devices(self.device_tracker.devices)
+        bytes_up, bytes_dn = self.global_counters.read()
+        scopes = {
+            'Global': {
+                'now': {
+                    'time': time.monotonic(),
+                    'bytes_up': bytes_up,
+                    'bytes_dn': bytes_dn,
+                },
+            },
+        }
+        self.rate_history.add_samples(scopes)
+        data_rates = self.rate_history.get_rates('Global')
+        return {
+            'device': self.device_tracker.device,
+            'rates': {'Global': data_rates} if data_rates else {},
+        }
+
+    def poll(self):
+        snapshot = self.subscription.latest()
+        if not self.subscription.connected:
+            snapshot = self.read_counters()
+        if snapshot:
+            self.show(snapshot)
+        return True
+
+    def show(self, snapshot):
+        rates_by_scope = snapshot.get('rates', {})
+        text = format_rates(rates_by_scope.get('Global'))
+        self.item_global.set_label(f"Global: {text}")
+        if self.indicator:
+            self.indicator.set_label(text, '')
+        else:
+            self.icon.set_tooltip_text(f"Traffic Cop\n{text}")
+        top = get_top_scopes(rates_by_scope)
+        for i, item in enumerate(self.scope_items):
+            if i < len(top):
+                scope, data_rates = top[i]
+                item.set_label(f"{scope}: {format_rates(data_rates)}")
+                item.show()
+            else:
+                item.hide()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='traffic-cop --tray',
+        description="Show the current Traffic Cop rates in the system tray.",
+    )
+    parser.add_argument(
+        '--tray', action='store_true',
+        help=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        '-d', '--debug', action='store_true',
+        help="Print DEBUG info to stdout.",
+    )
+    parser.add_argument(
+        '-i', '--interval', type=float, default=POLL_INTERVAL,
+        metavar='SECONDS',
+        help="Seconds between updates (default and minimum: 1).",
+    )
+    parser.add_argument(
+        '--socket', metavar='PATH',
+        help="Socket of the collector to get rates from (default: the"
+        " running one, if any).",
+    )
+    args = parser.parse_args(argv)
+
+    log_level = logging.DEBUG if args.debug else logging.INFO
+    utils.set_up_logging(log_level)
+    tray = Tray(args.socket, args.interval)
+    tray.start()
+    elapsed, rss = utils.get_startup_stats()
+    logging.info(f"Tray started in {elapsed:.2f} s; peak RSS: {rss} KiB")
+    try:
+        Gtk.main()
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,90 @@
+""" Parsing and formatting of tc rates. """
+
+import functools
+import re
+
+from fractions import Fraction
+
+# A rate as tc(8) accepts it: a decimal number, then either '%' (of the
+# interface rate) or an optional SI or IEC prefix with 'bit' or 'bps'. A bare
+# number is in bits per second. Units are not case-sensitive.
+RATE_RE = re.compile(
+    r'\s*(\d+\.?\d*|\.\d+)\s*(?:(%)|([kmgt]i?)?(bit|bps))?\s*',
+    re.IGNORECASE,
+)
+PREFIXES = {
+    '': 1,
+    'k': 10**3,
+    'm': 10**6,
+    'g': 10**9,
+    't': 10**12,
+    'ki': 2**10,
+    'mi': 2**20,
+    'gi': 2**30,
+    'ti': 2**40,
+}
+# Display units, each 1000 times the one before.
+BYTE_UNITS = ['B/s', 'KB/s', 'MB/s', 'GB/s', 'TB/s']
+
+
+@functools.lru_cache(maxsize=4096)
+def split_rate(text):
+    '''
+    Return (quantity, multiplier in B/s) for a tc rate, with the multiplier
+    None for a percentage. Raise ValueError if tc wouldn't accept the rate.
+    '''
+    m = RATE_RE.fullmatch(text)
+    if not m:
+        raise ValueError(f"Invalid rate: {text!r}")
+    qty, percent, prefix, unit = m.groups()
+    if percent:
+        return Fraction(qty), None
+    multiplier = Fraction(PREFIXES[(prefix or '').lower()])
+    if not unit or unit.lower() == 'bit':
+        multiplier /= 8
+    return Fraction(qty), multiplier
+
+
+def is_percent(text):
+    return split_rate(text)[1] is None
+
+
+def parse_rate(text, link_rate=None):
+    '''
+    Return the rate in whole bytes per second, rounded down as tc does.
+    A percentage needs the interface's link_rate in B/s.
+    '''
+    qty, multiplier = split_rate(text)
+    if multiplier is None:
+        if link_rate is None:
+            raise ValueError(f"No interface rate for {text!r}")
+        return int(qty * link_rate / 100)
+    return int(qty * multiplier)
+
+
+def format_bytes(bytes_per_sec):
+    '''
+    Return [rate, unit] with at most 3 digits before the decimal point.
+    '''
+    rate = bytes_per_sec
+    for unit in BYTE_UNITS[:-1]:
+        if abs(rate) < 1000:
+            return [rate, unit]
+        rate = rate / 1000
+    return [rate, BYTE_UNITS[-1]]
+
+
+@functools.lru_cache(maxsize=4096)
+def format_rate(text):
+    '''
+    Return a tc rate as (quantity, unit) for display, e.g.:
+        8bit -> ('1', 'B/s')
+        128kbit -> ('16', 'KB/s')
+        1.5mbit -> ('188', 'KB/s')
+        10% -> ('10', '%')
+    '''
+    qty, multiplier = split_rate(text)
+    if multiplier is None:
+        return (f"{float(qty):g}", '%')
+    rate, unit = format_bytes(int(qty * multiplier))
+    return (f"{rate:.0f}", unit)
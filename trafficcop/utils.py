@@ -1,4 +1,5 @@
 import contextlib
+import hashlib
 import locale
 import logging
 import netifaces
@@ -6,6 +7,7 @@ import os
 import psutil
 import pwd
 import re
+import resource
 import shutil
 import subprocess
 import sys
@@ -14,6 +16,16 @@ import time
 from packaging import version
 from pathlib import Path
 
+from . import units
+
+# Gateway address families, by priority.
+GATEWAY_FAMILIES = [
+    netifaces.AF_BLUETOOTH,
+    netifaces.AF_PPPOX,
+    netifaces.AF_INET6,
+    netifaces.AF_INET,
+]
+
 
 @contextlib.contextmanager
 def setlocale(*args, **kw):
@@ -37,13 +49,7 @@ def get_net_device():
         4. IPv4 (AF_INET)
     '''
     gws = netifaces.gateways()
-    families = [
-        netifaces.AF_BLUETOOTH,
-        netifaces.AF_PPPOX,
-        netifaces.AF_INET6,
-        netifaces.AF_INET,
-    ]
-    for family in families:
+    for family in GATEWAY_FAMILIES:
         try:
             device = gws['default'][family][1]
             break
@@ -53,6 +59,23 @@ def get_net_device():
     return device
 
 
+def get_net_devices():
+    '''
+    Return all devices that have a gateway, in the same priority order as
+    get_net_device().
+    '''
+    gws = netifaces.gateways()
+    devices = []
+    device = get_net_device()
+    if device:
+        devices.append(device)
+    for family in GATEWAY_FAMILIES:
+        for gw in gws.get(family, []):
+            if gw[1] not in devices:
+                devices.append(gw[1])
+    return devices
+
+
 def get_nethogs_version():
     cmd = ['nethogs', '-V']
     stdout = subprocess.PIPE
@@ -107,23 +130,8 @@ def convert_human_to_log(human):
 
 
 def convert_bytes_to_human(bytes_per_sec):
-    logging.debug(f"{bytes_per_sec=}")
     # "human" means "3 significant digits, changing power as necessary."
-    rate = bytes_per_sec
-    unit = 'B/s'
-    if len(str(int(rate))) > 3:
-        # Switch to KB.
-        rate = rate / 1000
-        unit = 'KB/s'
-        if len(str(int(rate))) > 3:
-            # Switch to MB.
-            rate = rate / 1000
-            unit = 'MB/s'
-            if len(str(int(rate))) > 3:
-                # Switch to GB.
-                rate = rate / 1000
-                unit = 'GB/s'
-    return [rate, unit]
+    return units.format_bytes(bytes_per_sec)
 
 
 def get_systemd_service_props():
@@ -212,13 +220,36 @@ def wait_for_tt_start(exe='/usr/bin/tt', maxct=100):
     return tt_pid, tt_start, tt_dev
 
 
-def check_diff(file1, file2):
-    result = subprocess.run(
-        ["diff", file1, file2],
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL
-    )
-    return result.returncode
+class FileDigest():
+    '''
+    SHA-256 digest of a file's content, only recomputed when the file's size
+    or mtime changes; None if the file can't be read.
+    '''
+    def __init__(self, path):
+        self.path = Path(path)
+        self.stat_key = None
+        self.value = None
+
+    @property
+    def digest(self):
+        try:
+            stat = self.path.stat()
+        except OSError:
+            self.stat_key = None
+            return None
+        stat_key = (stat.st_size, stat.st_mtime_ns)
+        if stat_key != self.stat_key:
+            try:
+                data = self.path.read_bytes()
+            except OSError:
+                return None
+            self.value = hashlib.sha256(data).hexdigest()
+            self.stat_key = stat_key
+        return self.value
+
+    def matches(self, other):
+        digest = self.digest
+        return digest is not None and digest == other.digest
 
 
 def ensure_config_file(runtime_config_file):
@@ -244,12 +275,21 @@ def run_command(command_tokens):
     return p.returncode
 
 
-def set_up_logging(log_level):
+def get_state_dir():
+    '''
+    Return the directory for the log and other files kept between runs.
+    '''
+    if os.getuid() == 0:
+        return Path('/var/lib/traffic-cop')
+    return Path('~/.local/state/traffic-cop').expanduser()
+
+
+def set_up_logging(log_level, console=True):
     # Define log file.
     if os.getuid() == 0:
         log_dir = Path('/var/log/traffic-cop')
     else:
-        log_dir = Path('~/.local/state/traffic-cop').expanduser()
+        log_dir = get_state_dir()
     log_dir.mkdir(parents=True, exist_ok=True)
     log_file_path = log_dir / 'traffic-cop.log'
 
@@ -264,6 +304,9 @@ def set_up_logging(log_level):
         stderr_level = log_level
     stderr_h.setLevel(stderr_level)
     handlers = [file_h, stdout_h, stderr_h]
+    if not console:
+        # The terminal is in use, e.g. by curses.
+        handlers = [file_h]
 
     # Set initial config.
     logging.basicConfig(
@@ -279,3 +322,12 @@ def set_up_logging(log_level):
 
 def get_user_from_uid(uid):
     return pwd.getpwuid(uid).pw_name
+
+
+def get_startup_stats():
+    '''
+    Return the seconds since this process started and its peak RSS in KiB.
+    '''
+    started = psutil.Process().create_time()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return time.time() - started, rss
@@ -0,0 +1,291 @@
+""" Watches of nethogs, the collector and files on the GLib main loop. """
+
+import logging
+import os
+import subprocess
+import time
+
+from gi.repository import Gio
+from gi.repository import GLib
+
+from . import client
+from . import nethogs
+from . import rates
+
+# Milliseconds without new output after which a nethogs refresh is complete.
+FRAME_QUIET_MS = 100
+# Milliseconds without further changes after which a file edit is complete.
+FILE_QUIET_MS = 300
+
+
+class NethogsWatch():
+    '''
+    Alternative to the T-nh and T-bw threads: nethogs' stdout is watched by a
+    GLib IO channel on the main loop and read without blocking, and the rates
+    are updated right there, so the config store is only ever touched from the
+    main loop.
+    '''
+    def __init__(self, app):
+        self.app = app
+        self.parser = nethogs.FrameParser()
+        self.buffer = b''
+        self.proc = None
+        self.watch_id = None
+        self.flush_id = None
+        self.update_id = None
+        self.last_update = 0
+
+    def start(self):
+        self.app.device_tracker.connect(self.on_device_changed)
+        # Keep the Global scope updated even if nethogs stays silent.
+        GLib.timeout_add_seconds(nethogs.FRAME_TIMEOUT, self.on_timeout)
+        self.start_nethogs()
+
+    def start_nethogs(self):
+        device = self.app.device_tracker.device
+        if not device:
+            # No current connection; wait for a device change.
+            return
+        self.parser = nethogs.FrameParser()
+        self.buffer = b''
+        cmd = nethogs.build_command(device)
+        self.proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        fd = self.proc.stdout.fileno()
+        os.set_blocking(fd, False)
+        channel = GLib.IOChannel.unix_new(fd)
+        self.watch_id = GLib.io_add_watch(
+            channel,
+            GLib.PRIORITY_DEFAULT,
+            GLib.IOCondition.IN | GLib.IOCondition.HUP | GLib.IOCondition.ERR,
+            self.on_output,
+        )
+
+    def stop_nethogs(self):
+        if self.watch_id:
+            GLib.source_remove(self.watch_id)
+            self.watch_id = None
+        if self.proc:
+            proc = self.proc
+            self.proc = None
+            proc.stdout.close()
+            if proc.poll() is None:
+                # Neither the kill (which can wait on polkit) nor nethogs'
+                # exit is waited for on the main loop; both are reaped later.
+                self.reap(proc)
+                self.kill_nethogs(proc)
+
+    def kill_nethogs(self, proc):
+        if os.geteuid() == 0:
+            proc.terminate()
+            return
+        # nethogs runs as root, so it has to be killed with pkexec, too.
+        kill = subprocess.Popen(['pkexec', 'kill', str(proc.pid)])
+        self.reap(kill)
+
+    def reap(self, proc):
+        GLib.child_watch_add(
+            GLib.PRIORITY_DEFAULT,
+            proc.pid,
+            self.on_reaped,
+            proc,
+        )
+
+    def on_reaped(self, pid, status, proc):
+        # GLib has reaped it; keep subprocess from trying again.
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        logging.info(f"Process {pid} exited: {proc.returncode}")
+
+    def on_device_changed(self, old, new):
+        logging.info(f"Restarting nethogs on device: {new}")
+        self.stop_nethogs()
+        self.start_nethogs()
+
+    def on_output(self, channel, condition):
+        try:
+            data = os.read(self.proc.stdout.fileno(), 65536)
+        except BlockingIOError:
+            return True
+        if not data:
+            # nethogs has exited.
+            logging.warning("nethogs stopped sending output.")
+            self.watch_id = None
+            self.reap(self.proc)
+            return False
+
+        *lines, self.buffer = (self.buffer + data).split(b'\n')
+        for line in lines:
+            frame = self.parser.feed(line.decode('utf-8', errors='replace'))
+            if frame:
+                self.on_frame(frame)
+
+        # nethogs doesn't mark the end of a refresh, so consider it complete
+        # once the output has been quiet for a moment.
+        if self.flush_id:
+            GLib.source_remove(self.flush_id)
+        self.flush_id = GLib.timeout_add(FRAME_QUIET_MS, self.on_quiet)
+        return True
+
+    def on_quiet(self):
+        self.flush_id = None
+        frame = self.parser.flush()
+        if frame:
+            self.on_frame(frame)
+        return False
+
+    def on_frame(self, frame):
+        self.app.net_hogs_q.put(frame)
+        if self.update_id:
+            # An update is already scheduled.
+            return
+        elapsed = time.monotonic() - self.last_update
+        wait = self.app.refresh_interval - elapsed
+        if wait > 0:
+            self.update_id = GLib.timeout_add(int(wait * 1000), self.update)
+        else:
+            self.update()
+
+    def on_timeout(self):
+        if not self.app.window.is_visible():
+            return True
+        elapsed = time.monotonic() - self.last_update
+        if elapsed >= nethogs.FRAME_TIMEOUT and not self.update_id:
+            self.update()
+        return True
+
+    def update(self):
+        self.update_id = None
+        if not self.app.window.is_visible():
+            return False
+        self.last_update = time.monotonic()
+        self.app.device_tracker.poll()
+        devices = self.app.device_tracker.devices
+        self.app.global_counters.set_devices(devices)
+        self.app.update_device_name()
+        self.app.scopes = rates.update_scopes(
+            self.app.scopes,
+            self.app.net_hogs_q,
+            self.app.config_model.matcher,
+            self.app.proc_table,
+            self.app.scope_cache,
+            self.app.global_counters,
+        )
+        self.app.rate_history.add_samples(self.app.scopes)
+        rates_dict = rates.get_rates_dict(
+            self.app.scopes,
+            self.app.rate_history,
+        )
+        if rates_dict:
+            rates.update_store_rates(self.app.config_store, rates_dict)
+        if self.app.sparklines:
+            self.app.sparklines.refresh(self.app.config_store)
+        return False
+
+
+class CollectorWatch():
+    '''
+    Client of a running collector: its snapshots are read on the main loop
+    instead of running nethogs in this process. If the collector stops,
+    nethogs is started here after all.
+    '''
+    def __init__(self, app, sock):
+        self.app = app
+        self.sock = sock
+        self.reader = client.SnapshotReader()
+        self.watch_id = None
+
+    def start(self):
+        logging.info("Getting rates from the collector.")
+        self.sock.setblocking(False)
+        channel = GLib.IOChannel.unix_new(self.sock.fileno())
+        self.watch_id = GLib.io_add_watch(
+            channel,
+            GLib.PRIORITY_DEFAULT,
+            GLib.IOCondition.IN | GLib.IOCondition.HUP | GLib.IOCondition.ERR,
+            self.on_input,
+        )
+
+    def on_input(self, channel, condition):
+        try:
+            data = self.sock.recv(65536)
+        except BlockingIOError:
+            return True
+        except OSError:
+            data = b''
+        if not data:
+            logging.warning("The collector stopped; running nethogs here.")
+            self.sock.close()
+            self.watch_id = None
+            self.app.start_sniffing()
+            return False
+        snapshots = self.reader.feed(data)
+        if snapshots:
+            # Totals are cumulative, so the latest snapshot is enough.
+            self.update(snapshots[-1])
+        return True
+
+    def update(self, snapshot):
+        if not self.app.window.is_visible():
+            return
+        self.app.device_tracker.poll()
+        self.app.update_device_name()
+        self.app.scopes = rates.update_scopes_from_snapshot(
+            self.app.scopes,
+            snapshot,
+        )
+        self.app.rate_history.add_samples(self.app.scopes)
+        rates_dict = rates.get_rates_dict(
+            self.app.scopes,
+            self.app.rate_history,
+        )
+        if rates_dict:
+            rates.update_store_rates(self.app.config_store, rates_dict)
+        if self.app.sparklines:
+            self.app.sparklines.refresh(self.app.config_store)
+
+
+class FileWatch():
+    '''
+    Call back once a file has been changed, created, replaced or deleted.
+    Editors save in several steps (e.g. write a temporary file and rename it
+    over the old one), so the callback waits until the events have stopped
+    for a moment.
+    '''
+    def __init__(self, path, callback):
+        self.file = Gio.File.new_for_path(str(path))
+        self.callback = callback
+        self.monitor = None
+        self.settle_id = None
+
+    def start(self):
+        try:
+            self.monitor = self.file.monitor_file(
+                Gio.FileMonitorFlags.WATCH_MOVES,
+                None,
+            )
+        except GLib.Error as e:
+            logging.warning(f"Not watching {self.file.get_path()}: {e}")
+            return
+        self.monitor.connect('changed', self.on_changed)
+
+    def on_changed(self, monitor, f, other_file, event_type):
+        logging.debug(f"{f.get_path()}: {event_type.value_nick}")
+        if self.settle_id:
+            GLib.source_remove(self.settle_id)
+        self.settle_id = GLib.timeout_add(FILE_QUIET_MS, self.on_settled)
+
+    def on_settled(self):
+        self.settle_id = None
+        self.callback()
+        return False
+
+    def stop(self):
+        if self.settle_id:
+            GLib.source_remove(self.settle_id)
+            self.settle_id = None
+        if self.monitor:
+            self.monitor.cancel()
+            self.monitor = None